@@ -0,0 +1,44 @@
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Times converting a single file from the command line in a fresh interpreter - the start-up cost paid by every
+# per-file invocation and worker process - reporting the median wall time and the peak RSS of the runs.
+#
+#   python -m benchmarks.cold_start [--module fossilregistryextractor.ghana_converter] [--pdf FILE] [--runs N]
+DefaultModule = "fossilregistryextractor.ghana_converter"
+DefaultPdf = os.path.join("tests", "pdfs", "ghana", "2018-OCTP-Productions.pdf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a converter's command line from a cold start")
+    parser.add_argument("--module", default=DefaultModule, help="converter module to run with python -m")
+    parser.add_argument("--pdf", default=DefaultPdf, help="PDF to convert")
+    parser.add_argument("--runs", type=int, default=5, help="number of runs - the median is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = shutil.copy(args.pdf, directory)
+        durations = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-m", args.module, filename, "--no-cache"], check=True)
+            durations.append(time.perf_counter() - started)
+        import_started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {args.module}"], check=True)
+        import_duration = time.perf_counter() - import_started
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS - and is the largest of any child process
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    print(f"{args.module}: median {statistics.median(durations):.3f}s over {args.runs} runs "
+          f"(min {min(durations):.3f}s), import alone {import_duration:.3f}s, peak RSS {peak_rss / (1024 * 1024):.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from fossilregistryextractor.field_linker import FieldLinker, normalise_field_name
+from fossilregistryextractor.poland_converter import PolandConverter
+
+# Times linking the field names of Poland's 2015 and 2020 reports to field ids with FieldLinker's trigram index,
+# against comparing each name with every field seen so far.
+#
+# For larger registries, the two reports' names are recombined into more fields (the first word or half of one name
+# with the rest of another, each distinct), and every field appears in two editions - as it is, then with its spelling
+# drifted as it drifts between real editions (accents lost, "Rej." added, a line break, a letter doubled). The time per
+# name should stay close to flat as the number of fields grows, while the pairwise comparison's grows with it. The
+# share of drifted names linked back to their field is reported too.
+#
+#   python -m benchmarks.field_linking [--scales 1 2 4 8 16] [--pairwise-limit 4000]
+DefaultPdfs = [os.path.join("tests", "pdfs", "poland", "natural_gas_2015.pdf"), os.path.join("tests", "pdfs", "poland", "natural_gas_2020.pdf")]
+
+
+# Links like FieldLinker, but compares each name with every field of the country
+class PairwiseLinker(FieldLinker):
+    def _best_match(self, country, trigrams, signature, document):
+        best, best_similarity = None, 0.0
+        for entity in self.entities.values():
+            if entity.country != country or entity.signature != signature or (document is not None and document in entity.documents):
+                continue
+            similarity = 2 * len(trigrams & entity.trigrams) / (len(trigrams) + len(entity.trigrams))
+            if similarity > best_similarity:
+                best, best_similarity = entity, similarity
+        return (best, best_similarity) if best_similarity >= self.threshold else (None, best_similarity)
+
+
+def time_linking(linker, documents):
+    started = time.perf_counter()
+    links = [[linker.link("Poland", name, document) for name in names] for document, names in documents]
+    return time.perf_counter() - started, links
+
+
+def synthetic_fields(names, count, rng):
+    fields = list(dict.fromkeys(names))
+    seen = {normalise_field_name(name) for name in fields}
+    while len(fields) < count:
+        first, second = rng.sample(names, 2)
+        first_words, second_words = first.split(), second.split()
+        if len(first_words) > 1 and len(second_words) > 1:
+            name = " ".join(first_words[:1] + second_words[1:])
+        else:
+            name = first[:max(3, len(first) // 2)] + second[len(second) // 2:]
+        if normalise_field_name(name) not in seen:
+            seen.add(normalise_field_name(name))
+            fields.append(name)
+    return fields[:count]
+
+
+def drift(name, rng):
+    choice = rng.randrange(4)
+    if choice == 0:
+        return name.translate(str.maketrans("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ", "acelnoszzACELNOSZZ"))
+    if choice == 1:
+        return "Rej. " + name
+    if choice == 2 and " " in name:
+        return name.replace(" ", " \n", 1)
+    position = rng.randrange(1, len(name)) if len(name) > 1 else 0
+    return name[:position] + name[position - 1:]
+
+
+def run(names, scales, pairwise_limit, rng):
+    results = []
+    for scale in scales:
+        fields = synthetic_fields(names, len(set(names)) * scale, rng)
+        drifted = [drift(name, rng) for name in fields]
+        documents = [("first edition", fields), ("second edition", drifted)]
+        result = {"fields": len(fields), "names": 2 * len(fields)}
+        duration, links = time_linking(FieldLinker(), documents)
+        result["indexed_seconds"] = duration
+        result["indexed_microseconds_per_name"] = duration / result["names"] * 1e6
+        result["linked"] = sum(1 for first, second in zip(*links) if first.field_id == second.field_id) / len(fields)
+        if len(fields) <= pairwise_limit:
+            duration, _ = time_linking(PairwiseLinker(), documents)
+            result["pairwise_seconds"] = duration
+            result["pairwise_microseconds_per_name"] = duration / result["names"] * 1e6
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time linking field names with the trigram index and pairwise")
+    parser.add_argument("pdfs", nargs="*", default=DefaultPdfs)
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 2, 4, 8, 16],
+                        help="numbers of fields, as multiples of the reports' own")
+    parser.add_argument("--pairwise-limit", type=int, default=4000, help="skip the pairwise comparison above this many fields")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    converter = PolandConverter()
+    reports = [(filename, [converter.record_field(r) for r in converter.iter_records(filename)]) for filename in args.pdfs]
+    report = {}
+    duration, links = time_linking(FieldLinker(), reports)
+    report["reports"] = {"names": sum(len(names) for _, names in reports),
+                         "fields": len({link.field_id for document_links in links for link in document_links}), "seconds": duration}
+    duration, _ = time_linking(PairwiseLinker(), reports)
+    report["reports"]["pairwise_seconds"] = duration
+    report["scaling"] = run([name for _, names in reports for name in names], args.scales, args.pairwise_limit, random.Random(args.seed))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+
+import pdfplumber as pdfplumber
+
+from benchmarks.stages import DefaultPdfDirectory
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.page_analysis import PageAnalysis
+
+# Compares, page by page, getting the header text and the table separately with pdfplumber (page.crop(...)
+# .extract_text() and page.extract_table(), as GermanyConverter did) with getting both from a PageAnalysis. The page's
+# objects are parsed before either is timed, as both share the one parse. Runs over the German report in tests/pdfs
+# by default, and any other PDFs given.
+#
+#   python -m benchmarks.page_analysis [PDF ...]
+
+
+def separately(page, header_height):
+    x0, top, x1, bottom = page.bbox
+    header_text = page.crop((x0, top, x1, min(bottom, top + header_height))).extract_text()
+    return header_text, page.extract_table()
+
+
+def analysed(page, header_height):
+    analysis = PageAnalysis(page)
+    return analysis.header_text(header_height), analysis.table()
+
+
+def benchmark_file(filename, repeats):
+    timings = {separately: 0.0, analysed: 0.0}
+    identical = 0
+    with pdfplumber.open(filename) as pdf:
+        for page in pdf.pages:
+            page.objects
+            results = {}
+            for fn in timings:
+                best = None
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    results[fn] = fn(page, GermanyConverter.HeaderRegionHeight)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[fn] = timings[fn] + best
+            identical = identical + (1 if results[separately] == results[analysed] else 0)
+            page.flush_cache()
+        return len(pdf.pages), identical, timings[separately], timings[analysed]
+
+
+def find_pdfs(directory):
+    for parent, _, filenames in sorted(os.walk(directory)):
+        for name in sorted(filenames):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(parent, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare separate text and table extraction with a single page analysis")
+    parser.add_argument("filenames", nargs="*", help="PDFs to run over (default: every PDF in tests/pdfs)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each extraction - the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'file':<40} {'pages':>6} {'same':>5} {'separate ms/page':>17} {'analysed ms/page':>17} {'saving':>7}")
+    for filename in args.filenames or find_pdfs(DefaultPdfDirectory):
+        pages, identical, separate_seconds, analysed_seconds = benchmark_file(filename, args.repeats)
+        print(f"{os.path.basename(filename):<40} {pages:>6} {identical:>5} {separate_seconds / pages * 1000:>17.1f} "
+              f"{analysed_seconds / pages * 1000:>17.1f} {(1 - analysed_seconds / separate_seconds) * 100:>6.0f}%")
+
+
+if __name__ == '__main__':
+    main()
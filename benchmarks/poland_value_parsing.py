@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import pandas as pd
+import pdfplumber as pdfplumber
+
+from fossilregistryextractor.poland_converter import PolandConverter
+
+
+# Compares the vectorized conversion of Poland's status, county and resource/output columns with the original
+# per-cell conversion, over a report's tables repeated to stand in for many years of reports. The extraction time
+# of the report is shown alongside for scale.
+#
+#   python -m benchmarks.poland_value_parsing [--copies 20] [tests/pdfs/poland/natural_gas_2020.pdf]
+def convert_cell_by_cell(converter, df):
+    df["Country"] = "Poland"
+    df["Country"] = df["Country"].astype("string")
+    df["State of development"] = df["State of development"].apply(converter._lookup_status).astype("string")
+    df["County"] = df["County"].apply(converter._convert_county)
+    for c in filter(lambda s: "Resources" in s or "Output" in s, df.columns):
+        df[c] = df[c].apply(converter._convert_value)
+    return df
+
+
+def convert_vectorized(converter, df):
+    return converter._convert_dataframe(df)
+
+
+def best_time(convert, converter, df, repeats):
+    best = None
+    for _ in range(repeats):
+        copy = df.copy()
+        started = time.perf_counter()
+        result = convert(converter, copy)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Poland's per-cell and vectorized value parsing")
+    parser.add_argument("filename", nargs="?", default="tests/pdfs/poland/natural_gas_2020.pdf")
+    parser.add_argument("--copies", type=int, default=20, help="number of times to repeat the report's tables")
+    parser.add_argument("--repeats", type=int, default=5, help="runs of each path - the fastest is reported")
+    args = parser.parse_args()
+
+    converter = PolandConverter()
+    started = time.perf_counter()
+    with pdfplumber.open(args.filename) as pdf:
+        pages = [converter._build_dataframe(page.extract_table()) for page in pdf.pages]
+    extraction = time.perf_counter() - started
+
+    print(f"{'copies':>6} {'rows':>7} {'per-cell':>10} {'vectorized':>11} {'speedup':>8}")
+    for copies in sorted({1, args.copies}):
+        df = pd.concat(pages * copies)
+        cell_by_cell, expected = best_time(convert_cell_by_cell, converter, df, args.repeats)
+        vectorized, actual = best_time(convert_vectorized, converter, df, args.repeats)
+        if not expected.equals(actual):
+            raise SystemExit("Vectorized parsing gave different results from per-cell parsing")
+        print(f"{copies:>6} {len(df):>7} {cell_by_cell * 1000:>8.1f}ms {vectorized * 1000:>9.1f}ms {cell_by_cell / vectorized:>7.1f}x")
+    print(f"(extracting the tables of one copy took {extraction * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
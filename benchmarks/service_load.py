@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from fossilregistryextractor.service import Converters, ExtractionServer, ExtractionService, percentiles
+
+# Load-tests the extraction service: uploads a PDF from several clients at once and streams back each job's results,
+# retrying uploads the service rejects while its queue is full. Reports the documents converted per second, the
+# rejections and the client-side latency percentiles, followed by the service's own /stats. Starts a service in this
+# process unless --url points at one that is already running. Everything runs locally.
+#
+#   python -m benchmarks.service_load [--url http://127.0.0.1:8765] [--requests N] [--concurrency C] [--workers W]
+#
+# --subprocess-baseline also converts the PDF the same number of times by starting python -m <converter> for each,
+# with the same concurrency, for comparison.
+DefaultPdf = os.path.join("tests", "pdfs", "ghana", "2018-OCTP-Productions.pdf")
+
+
+def convert(url, pdf, converter):
+    started = time.perf_counter()
+    rejections = 0
+    while True:
+        request = urllib.request.Request(f"{url}/jobs?converter={converter}", data=pdf, headers={"Content-Type": "application/pdf"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                job_id = json.load(response)["job"]
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                raise
+            rejections = rejections + 1
+            time.sleep(float(e.headers.get("Retry-After", 1)) / 10)
+    with urllib.request.urlopen(f"{url}/jobs/{job_id}/results") as response:
+        rows = sum(1 for _ in response)
+    return time.perf_counter() - started, rejections, rows
+
+
+def run_load(url, pdf, converter, requests, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: convert(url, pdf, converter), range(requests)))
+    duration = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration": duration,
+        "documents_per_second": requests / duration,
+        "rejections": sum(r[1] for r in results),
+        "rows": sum(r[2] for r in results),
+        "latency": percentiles([r[0] for r in results]),
+    }
+
+
+def run_subprocesses(filename, converter, requests, concurrency):
+    module = sys.modules[Converters[converter].__module__].__name__
+    with tempfile.TemporaryDirectory() as directory:
+        copies = [shutil.copy(filename, os.path.join(directory, f"{i}.pdf")) for i in range(requests)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda copy: subprocess.run([sys.executable, "-m", module, copy, "--format", "ndjson", "--no-cache"],
+                                                          check=True), copies))
+        duration = time.perf_counter() - started
+    return {"requests": requests, "duration": duration, "documents_per_second": requests / duration}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the extraction service")
+    parser.add_argument("--url", default=None, help="a running service (default: start one in this process)")
+    parser.add_argument("--pdf", default=DefaultPdf, help="PDF to upload")
+    parser.add_argument("--converter", default="ghana", choices=list(Converters))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8, help="number of clients uploading at once")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the service started here")
+    parser.add_argument("--queue-size", type=int, default=4, help="queue size of the service started here")
+    parser.add_argument("--subprocess-baseline", action="store_true", help="also time starting a process per conversion")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as infile:
+        pdf = infile.read()
+    service = server = None
+    url = args.url
+    if url is None:
+        service = ExtractionService(workers=args.workers, queue_size=args.queue_size)
+        service.warm_up()
+        server = ExtractionServer(("127.0.0.1", 0), service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        report = {"service": run_load(url, pdf, args.converter, args.requests, args.concurrency)}
+        with urllib.request.urlopen(f"{url}/stats") as response:
+            report["stats"] = json.load(response)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.close()
+    if args.subprocess_baseline:
+        report["subprocess"] = run_subprocesses(args.pdf, args.converter, args.requests, args.concurrency)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
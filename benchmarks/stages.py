@@ -0,0 +1,153 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pdfplumber as pdfplumber
+
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.instrumentation import Observer
+from fossilregistryextractor.poland_converter import PolandConverter
+from tests.synthetic_pdf import write_poland_pdf
+
+
+# Times each stage of each converter's process_file (its JSON output) over the PDFs in tests/pdfs - opening the PDF,
+# extract_table, extract_text, building the records, converting their types and serializing to JSON, as reported by
+# the converter's own stage events (see instrumentation.Observer), and "other" for the rest (parsing pages, putting
+# tables together) - along with the peak RSS of the run. Because the converter itself is run, the timings follow
+# whatever path the output is actually built by. To show how time and memory scale with the size of a document,
+# Poland reports of several page counts are generated too (see tests/synthetic_pdf.py), each a single PDF converted
+# once. Each case runs in a process of its own so that its peak RSS is its own.
+#
+# The results are written as JSON, and compared with a stored baseline (e.g. from before a pdfplumber upgrade):
+#
+#   python -m benchmarks.stages --save-baseline              # record benchmarks/baseline.json
+#   python -m benchmarks.stages --threshold 0.2              # exits with 1 if anything got more than 20% worse
+#
+# Stages missing from the baseline (e.g. one recorded before the stages were renamed) aren't compared - save a new one
+Converters = {"ghana": GhanaConverter, "poland": PolandConverter, "germany": GermanyConverter}
+
+Stages = ["open", "extract_table", "extract_text", "records", "dataframe", "convert", "serialize", "other"]
+
+DefaultPdfDirectory = os.path.join("tests", "pdfs")
+DefaultBaseline = os.path.join("benchmarks", "baseline.json")
+
+# Stages quicker than this in the baseline are too noisy to compare
+MinimumComparableSeconds = 0.05
+
+
+# Adds up the durations of the converter's stage events, and counts its pages and rows
+class StageTimer(Observer):
+    def __init__(self):
+        self.durations = {stage: 0.0 for stage in Stages}
+        self.pages = 0
+        self.rows = 0
+
+    def event(self, name, **fields):
+        if name == "stage":
+            self.durations[fields["stage"]] = self.durations[fields["stage"]] + fields["duration"]
+        elif name == "page_start":
+            self.pages = self.pages + 1
+        elif name == "document_end":
+            self.rows = self.rows + fields["rows"]
+
+
+# Runs in a process of its own - the fastest of the repeats is reported for each stage
+def run_case(country, filename, repeats):
+    best = None
+    total = None
+    for _ in range(repeats):
+        timer = StageTimer()
+        converter = Converters[country](observer=timer)
+        started = time.perf_counter()
+        converter.process_file(filename)
+        elapsed = time.perf_counter() - started
+        timer.durations["other"] = elapsed - sum(timer.durations.values())
+        best = timer.durations if best is None else {s: min(best[s], timer.durations[s]) for s in Stages}
+        total = elapsed if total is None else min(total, elapsed)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"converter": Converters[country].__name__, "file": filename, "pages": timer.pages,
+            "rows": timer.rows, "total": total, "stages": best, "peak_rss_mb": peak_rss / (1024 * 1024)}
+
+
+def find_cases(pdf_directory):
+    for country in sorted(Converters):
+        directory = os.path.join(pdf_directory, country)
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if filename.lower().endswith(".pdf"):
+                    yield country, os.path.join(directory, filename)
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, case in results["cases"].items():
+        baseline_case = baseline["cases"].get(name)
+        if baseline_case is None:
+            continue
+        metrics = [("total", case["total"], baseline_case["total"]), ("peak_rss_mb", case["peak_rss_mb"], baseline_case["peak_rss_mb"])]
+        metrics += [(stage, case["stages"][stage], baseline_case["stages"][stage]) for stage in Stages if stage in baseline_case["stages"]]
+        for metric, value, baseline_value in metrics:
+            comparable = metric == "peak_rss_mb" or baseline_value >= MinimumComparableSeconds
+            if comparable and value > baseline_value * (1 + threshold):
+                regressions.append(f"{name} {metric}: {baseline_value:.3f} -> {value:.3f} (+{(value / baseline_value - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'case':<58} {'total':>8} " + " ".join(f"{s:>13}" for s in Stages) + f" {'rss MB':>8}")
+    for name, case in results["cases"].items():
+        print(f"{name:<58} {case['total']:>8.3f} " + " ".join(f"{case['stages'][s]:>13.3f}" for s in Stages) + f" {case['peak_rss_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of each converter over the bundled PDFs")
+    parser.add_argument("--pdfs", default=DefaultPdfDirectory, help="directory with a ghana, poland and/or germany folder of PDFs")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 80], help="page counts of the synthetic Poland reports")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each case - the fastest is reported")
+    parser.add_argument("--output", default="bench_output.json", help="file to write the results to")
+    parser.add_argument("--baseline", default=DefaultBaseline, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown (as a fraction) counted as a regression")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "pdfplumber": pdfplumber.__version__, "pandas": pd.__version__},
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic = [("poland", write_poland_pdf(os.path.join(directory, f"synthetic_{pages}_pages.pdf"), pages)) for pages in args.pages]
+        for country, filename in list(find_cases(args.pdfs)) + synthetic:
+            with context.Pool(1) as pool:
+                case = pool.apply(run_case, (country, filename, args.repeats))
+            results["cases"][f"{case['converter']} {os.path.basename(filename)}"] = case
+    print_results(results)
+
+    output = args.baseline if args.save_baseline else args.output
+    with open(output, "w", encoding="utf-8") as outfile:
+        json.dump(results, outfile, indent=2)
+    print(f"Results written to {output}")
+
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as infile:
+            regressions = compare(results, json.load(infile), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+
+import pdfplumber as pdfplumber
+
+from benchmarks.stages import DefaultPdfDirectory
+from fossilregistryextractor.page_analysis import PageAnalysis
+from fossilregistryextractor.table_templates import TableTemplate
+
+# Compares pdfplumber's full table detection (page.extract_table()) with extraction from a table layout template
+# learned from the document's first page, over every page of each PDF in tests/pdfs. The page's objects are parsed
+# before either is timed, as parsing costs the same for both. Pages that don't fit the template fall back to full
+# detection, so their time is counted for both attempts.
+#
+#   python -m benchmarks.table_templates [--pdfs DIRECTORY] [--repeats N]
+
+
+def time_call(fn, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def benchmark_file(filename, repeats):
+    generic_seconds = 0.0
+    template_seconds = 0.0
+    fitted = 0
+    identical = 0
+    with pdfplumber.open(filename) as pdf:
+        _, template = TableTemplate.detect(PageAnalysis(pdf.pages[0]))
+        for page in pdf.pages:
+            page.objects
+            generic, generic_time = time_call(page.extract_table, repeats)
+            if template is None:
+                templated, template_time = None, 0.0
+            else:
+                templated, template_time = time_call(lambda: template.extract_table(page), repeats)
+            generic_seconds = generic_seconds + generic_time
+            if templated is None:
+                template_seconds = template_seconds + template_time + generic_time
+            else:
+                fitted = fitted + 1
+                identical = identical + (1 if templated == generic else 0)
+                template_seconds = template_seconds + template_time
+            page.flush_cache()
+        return {"file": filename, "pages": len(pdf.pages), "fitted": fitted, "identical": identical,
+                "generic": generic_seconds, "template": template_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full table detection with template extraction")
+    parser.add_argument("--pdfs", default=DefaultPdfDirectory, help="directory of PDFs (searched recursively)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each extraction - the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'file':<50} {'pages':>6} {'fitted':>7} {'same':>5} {'generic s':>10} {'template s':>11} {'speedup':>8}")
+    for directory, _, filenames in sorted(os.walk(args.pdfs)):
+        for name in sorted(filenames):
+            if name.lower().endswith(".pdf"):
+                result = benchmark_file(os.path.join(directory, name), args.repeats)
+                print(f"{name:<50} {result['pages']:>6} {result['fitted']:>7} {result['identical']:>5} {result['generic']:>10.3f} "
+                      f"{result['template']:>11.3f} {result['generic'] / result['template']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
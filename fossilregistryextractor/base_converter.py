@@ -1,14 +1,338 @@
+import argparse
+import itertools
+import json
+import os
+import time
 from abc import abstractmethod, ABC
+from contextlib import contextmanager, nullcontext
+
+import pdfplumber as pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfplumber.page import Page
+
+from .instrumentation import JsonLinesMetricsSink, Observer, ProfileCapture
+from .page_analysis import PageAnalysis, PageContent
+from .page_cache import PageCache
+from .table_templates import TemplateStore
+from .time_budget import BudgetExceeded, TimeBudget
+from .writers import Writers
 
 
 # Parent of the various other converters, providing shared methods
 class BaseConverter(ABC):
-    def process_and_save_file(self, filename):
-        table_as_json_string = self.process_file(filename)
-        output_filename = filename.replace(".pdf", ".json")
+    # The column naming the field each record is about, where there is one
+    FieldColumn = None
+    # The document_classifier.Fingerprints of the PDFs this converter handles, for choosing it from a PDF's first page
+    Fingerprints = ()
+
+    # Pass a PageCache to reuse the raw tables and text extracted from unchanged pages by earlier runs, and an
+    # instrumentation.Observer to receive events about the documents, pages and stages as they are converted.
+    # With low_memory, nothing parsed from a page is kept once the converter has moved on from it (see _iter_pages).
+    # Pass a table_templates.TemplateStore to extract tables with the layouts learned from earlier pages and files,
+    # and a time_budget.TimeBudget to limit the time spent on each page and document (see extract_page_table).
+    # variant is the layout variant of the documents, where the document_classifier has chosen one (see Fingerprints)
+    def __init__(self, cache=None, observer=None, low_memory=False, templates=None, budget=None, variant=None):
+        self.cache = cache
+        self.observer = observer if observer is not None else Observer()
+        self.low_memory = low_memory
+        self.templates = templates
+        self.budget = budget
+        self.variant = variant
+        self.skipped_pages = []
+        self._page_rows = 0
+        self._filename = None
+
+    def process_and_save_file(self, filename, **options):
+        table_as_json_string = self.process_file(filename, **options)
+        output_filename = self.output_filename(filename)
         with open(output_filename, "w") as outfile:
             outfile.write(table_as_json_string)
+        self.save_metadata(filename)
+        return output_filename
+
+    # Pages left out of the last document converted because they ran out of time are listed in a .meta.json file
+    # alongside its output, which is removed when a later conversion of the document has none. Returns the name of
+    # the file, or None
+    def save_metadata(self, filename):
+        metadata_filename = self.output_filename(filename, ".meta.json")
+        if not self.skipped_pages:
+            if os.path.exists(metadata_filename):
+                os.remove(metadata_filename)
+            return None
+        with open(metadata_filename, "w", encoding="utf-8") as outfile:
+            json.dump({"file": os.path.basename(filename), "skipped_pages": self.skipped_pages}, outfile, indent=2)
+        return metadata_filename
+
+    # The name of the field (or whatever else) an output record is about, e.g. for registry_store
+    def record_field(self, record):
+        return record.get(self.FieldColumn) if self.FieldColumn is not None else None
+
+    @staticmethod
+    def output_filename(filename, extension=".json"):
+        return os.path.splitext(filename)[0] + extension
+
+    # Writes the output in one of the formats in writers.Writers, returning the names of the files written
+    def process_and_write_file(self, filename, output_format="json", **options):
+        return Writers[output_format].write(self, filename, **options)
+
+    # Writes the records as newline-delimited JSON as they are produced, without holding the whole document in memory
+    def stream_and_save_file(self, filename):
+        output_filename = self.output_filename(filename, ".ndjson")
+        with open(output_filename, "w", encoding="utf-8") as outfile:
+            for record in self.iter_records(filename):
+                outfile.write(json.dumps(record, ensure_ascii=False))
+                outfile.write("\n")
+        self.save_metadata(filename)
+        return output_filename
 
     @abstractmethod
     def process_file(self, filename):
         pass
+
+    # Yields the output records a page at a time, so memory use is bounded by a single page rather than the document.
+    # Records from documents holding several kinds of table are labelled with the purpose of their table
+    def iter_records(self, filename):
+        for purpose, df in self.iter_dataframes(filename):
+            with self._observe_stage("serialize"):
+                records = self._to_json(df)
+            for record in records:
+                yield record if purpose is None else {"purpose": purpose, **record}
+
+    # Yields the purpose of each table (None for documents with a single kind of table) and its DataFrame, a page
+    # at a time for tables spread across several pages
+    @abstractmethod
+    def iter_dataframes(self, filename):
+        pass
+
+    @staticmethod
+    def _to_json(dataframe):
+        out = dataframe.to_json(orient="records", date_format="iso")
+        return json.loads(out)
+
+    # Each page's parsed layout objects are released once the caller has moved on to the next page, and the PDF is
+    # closed however the iteration ends. The time taken over a page, reported in its page_end event, runs until then.
+    #
+    # pdfplumber's pdf.pages holds every page of the document, and pdfminer keeps every object it has parsed (such as
+    # each page's decoded content stream) until the PDF is closed, so memory still grows with the page count. In
+    # low_memory mode the pages are created one at a time instead, and pdfminer's object caches are emptied after each
+    # page, so memory use stays level however long the document - at the cost of parsing shared objects such as
+    # fonts again for each page.
+    #
+    # Once the document's time budget has run out, the rest of its pages are skipped
+    def _iter_pages(self, filename, start=0, end=None):
+        with self._observe_stage("open"):
+            pdf = pdfplumber.open(filename)
+        self._filename = filename
+        if self.budget is not None:
+            self.budget.start_document()
+        try:
+            pages = self._create_pages(pdf, start, end) if self.low_memory else pdf.pages[start:end]
+            for page in pages:
+                if self.budget is not None and self.budget.document_exceeded():
+                    self._skip_page(filename, page.page_number, "document time budget exceeded", record=True)
+                    continue
+                self._event("page_start", file=filename, page=page.page_number)
+                started = time.perf_counter()
+                self._page_rows = 0
+                yield page
+                self._event("page_end", file=filename, page=page.page_number, duration=time.perf_counter() - started, rows=self._page_rows)
+                page.flush_cache()
+                if self.low_memory:
+                    pdf.doc._cached_objs.clear()
+                    pdf.doc._parsed_objs.clear()
+        finally:
+            pdf.close()
+
+    # The equivalent of pdf.pages[start:end], creating each page only as it is needed rather than keeping them all
+    @staticmethod
+    def _create_pages(pdf, start=0, end=None):
+        doctop = 0
+        for i, page_obj in enumerate(itertools.islice(PDFPage.create_pages(pdf.doc), end)):
+            page = Page(pdf, page_obj, page_number=i + 1, initial_doctop=doctop)
+            doctop += page.height
+            if i >= start:
+                yield page
+
+    # The number of pages in the document, from its page tree - without parsing the pages themselves
+    @staticmethod
+    def page_count(filename):
+        with pdfplumber.open(filename) as pdf:
+            count = resolve1(resolve1(pdf.doc.catalog.get("Pages", {})).get("Count")) if "Pages" in pdf.doc.catalog else None
+            return count if isinstance(count, int) else len(pdf.pages)
+
+    # Counts rows produced from the current page of _iter_pages
+    def _add_rows(self, rows):
+        self._page_rows = self._page_rows + rows
+
+    def _event(self, name, **fields):
+        self.observer.event(name, converter=type(self).__name__, **fields)
+
+    # Reports a page left out of the output. Pages lost to the time budget are also recorded in skipped_pages, to be
+    # saved alongside the output - unlike pages left out by design, such as those without a wanted table
+    def _skip_page(self, filename, page_number, reason, record=False):
+        if any(skipped["page"] == page_number for skipped in self.skipped_pages):
+            return
+        self._event("page_skipped", file=filename, page=page_number, reason=reason)
+        if record:
+            self.skipped_pages.append({"page": page_number, "reason": reason})
+
+    # Reports the start and end of converting a document - set "rows" (or anything else to report) in the dict
+    @contextmanager
+    def _observe_document(self, filename):
+        document = {"rows": 0}
+        self.skipped_pages = []
+        self._event("document_start", file=filename)
+        started = time.perf_counter()
+        try:
+            yield document
+        except Exception as e:
+            document["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._event("document_end", file=filename, duration=time.perf_counter() - started, **document)
+
+    @contextmanager
+    def _observe_stage(self, stage, page_number=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._event("stage", stage=stage, page=page_number, duration=time.perf_counter() - started)
+
+    # The text at the top of the page (or all its text, without a header_height) and its table, from a single parse
+    # of the page. wants_table is given the text, so that the table need only be found on pages that have a wanted one.
+    # check is given the text and a table found with the time budget's fallback settings (see extract_page_table)
+    def analyse_page(self, page, header_height=None, wants_table=None, check=None):
+        analysis = PageAnalysis(page)
+        header_text = self.extract_page_text(page, header_height, analysis)
+        table = None
+        if wants_table is None or wants_table(header_text):
+            table = self.extract_page_table(page, analysis=analysis, check=None if check is None else lambda t: check(header_text, t))
+        return PageContent(header_text, table)
+
+    # With templates, the table is extracted with the first of this converter's templates that fits the page. If none
+    # does, the table is found by pdfplumber's full table detection, and the page's layout learned for later pages.
+    #
+    # With a time budget, full table detection runs in a process that is killed if the page runs out of time, and is
+    # then tried again with each of the budget's cheaper fallback table settings. A table found that way may not be
+    # laid out as the converter expects, so is only used if check(table) doesn't raise. If no table is found in time,
+    # the page is skipped and recorded in skipped_pages, and None returned
+    def extract_page_table(self, page, table_settings=None, analysis=None, check=None):
+        analysis = analysis or PageAnalysis(page)
+        with self._observe_stage("extract_table", page.page_number):
+            if self.templates is not None and table_settings is None:
+                table = self._extract_with_template(page)
+                if table is not None:
+                    return table
+            if self.budget is None:
+                return self._detect_table(page, table_settings, analysis)
+            # The page is parsed here rather than in each attempt's process, so that every attempt can use it
+            page.objects
+            for i, settings in enumerate((table_settings,) + tuple(self.budget.fallback_table_settings)):
+                try:
+                    table = self._detect_table(page, settings, analysis, self.budget.call)
+                except BudgetExceeded as e:
+                    self._event("page_timeout", file=self._filename, page=page.page_number, table_settings=settings, error=str(e))
+                    continue
+                if i == 0:
+                    return table
+                if table is not None and self._passes_check(page, settings, table, check):
+                    return table
+            self._skip_page(self._filename, page.page_number, "time budget exceeded", record=True)
+            return None
+
+    def _passes_check(self, page, table_settings, table, check):
+        try:
+            if check is not None:
+                check(table)
+            return True
+        except Exception as e:
+            self._event("page_fallback_rejected", file=self._filename, page=page.page_number, table_settings=table_settings,
+                        error=f"{type(e).__name__}: {e}")
+            return False
+
+    # Full table detection, called by run if given
+    def _detect_table(self, page, table_settings, analysis, run=None):
+        if self.templates is not None and table_settings is None:
+            return self._cached_table(page, None, lambda: self.templates.detect(type(self).__name__, analysis, run))
+
+        def detect(): return analysis.table(table_settings)
+        def run_detect(): return run(detect)
+        return self._cached_table(page, table_settings, detect if run is None else run_detect)
+
+    def _cached_table(self, page, table_settings, extract):
+        if self.cache is None:
+            return extract()
+        return self.cache.extract_table(page, table_settings, extract)
+
+    def _extract_with_template(self, page):
+        family = type(self).__name__
+        for template in self.templates.candidates(family):
+            if self.cache is None:
+                table = template.extract_table(page)
+            else:
+                table = self.cache.extract_template_table(page, template)
+            if table is not None:
+                self.templates.use(family, template)
+                self.templates.hits = self.templates.hits + 1
+                return table
+        self.templates.misses = self.templates.misses + 1
+        return None
+
+    # The text of the top header_height points of the page, or all of it
+    def extract_page_text(self, page, header_height=None, analysis=None):
+        analysis = analysis or PageAnalysis(page)
+        with self._observe_stage("extract_text", page.page_number):
+            if header_height is None:
+                extract = analysis.text
+            else:
+                def extract(): return analysis.header_text(header_height)
+            if self.cache is None:
+                return extract()
+            return self.cache.extract_text(page, None if header_height is None else {"header_height": header_height}, extract)
+
+    @classmethod
+    def argument_parser(cls):
+        parser = argparse.ArgumentParser(description=f"Convert a PDF to JSON with the {cls.__name__}")
+        parser.add_argument("filename", help="PDF to convert - the output is written alongside it")
+        parser.add_argument("--format", choices=list(Writers), default="json",
+                            help="output format - ndjson streams one JSON record per line, csv/parquet/arrow write the "
+                                 "converted tables directly, with multi-value cells in a separate .values file")
+        parser.add_argument("--no-cache", action="store_true", help="extract every page afresh, without the page cache")
+        parser.add_argument("--clear-cache", action="store_true", help="empty the page cache before converting")
+        parser.add_argument("--cache-dir", default=None, help=f"location of the page cache (default {PageCache.DefaultDirectory})")
+        parser.add_argument("--low-memory", action="store_true",
+                            help="release everything parsed from each page once it is converted, for very long documents")
+        parser.add_argument("--templates", default=None,
+                            help="JSON file of table layouts - tables on pages that fit a layout learned from earlier "
+                                 "pages and files are extracted without full table detection, and new layouts are saved")
+        parser.add_argument("--page-timeout", type=float, default=None,
+                            help="seconds allowed for finding each page's table before trying cheaper settings, and then skipping the page")
+        parser.add_argument("--document-timeout", type=float, default=None, help="seconds allowed for the whole document - later pages are skipped")
+        parser.add_argument("--metrics", default=None, help="append events about each document, page and stage to this file as JSON lines")
+        parser.add_argument("--profile", default=None, help="profile the conversion with cProfile, writing the statistics to this file")
+        return parser
+
+    # Converter-specific command line options to pass on to process_file
+    def process_options(self, args):
+        return {}
+
+    @classmethod
+    def main(cls, argv=None):
+        args = cls.argument_parser().parse_args(argv)
+        cache = PageCache(args.cache_dir)
+        if args.clear_cache:
+            cache.clear()
+        observer = JsonLinesMetricsSink(args.metrics) if args.metrics else None
+        templates = TemplateStore(args.templates) if args.templates else None
+        budget = TimeBudget(args.page_timeout, args.document_timeout) if args.page_timeout or args.document_timeout else None
+        converter = cls(cache=None if args.no_cache else cache, observer=observer, low_memory=args.low_memory, templates=templates,
+                        budget=budget)
+        options = converter.process_options(args) if args.format == "json" else {}
+        with ProfileCapture(args.profile) if args.profile else nullcontext():
+            converter.process_and_write_file(args.filename, args.format, **options)
+        if templates is not None:
+            templates.save()
+        if observer is not None:
+            observer.close()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .document_classifier import DocumentClassifier, UnknownDocument
+from .germany_converter import GermanyConverter
+from .ghana_converter import GhanaConverter
+from .instrumentation import JsonLinesMetricsSink
+from .page_cache import PageCache, hash_file
+from .poland_converter import PolandConverter
+from .registry_store import RegistryStore
+from .time_budget import TimeBudget
+
+
+# Converts every PDF beneath a directory, choosing the converter for each file from the fingerprints of its first page
+# (see document_classifier.DocumentClassifier) in the worker process, before converting it. Files are converted
+# concurrently on a process pool, and a file is skipped if its JSON output is newer than it and its content hash
+# matches the one recorded in the manifest when it was last converted - with the converter recorded there. A file that fails to convert is recorded in
+# the summary without stopping the rest of the batch, as is a file with pages skipped for running out of time (see
+# time_budget.TimeBudget) - the skipped pages are listed in its .meta.json file.
+#
+# With a database, the records of each file converted are loaded into it (see registry_store.RegistryStore) from the
+# JSON output, by this process as each file is done
+class BatchRunner:
+    Classifier = DocumentClassifier([GhanaConverter, PolandConverter, GermanyConverter])
+
+    ManifestFilename = ".fossilregistry-manifest.json"
+    SummaryFilename = "batch-summary.json"
+
+    def __init__(self, directory, workers=None, force=False, cache=None, observer=None, budget=None, database=None):
+        self.directory = directory
+        self.workers = workers
+        self.force = force
+        self.cache = cache
+        self.observer = observer
+        self.budget = budget
+        self.database = database
+
+    def run(self):
+        started = time.perf_counter()
+        manifest = self._load_manifest()
+        results = []
+        pending = []
+        for path in self._find_pdfs():
+            relative_path = os.path.relpath(path, self.directory)
+            manifest_entry = manifest.get(relative_path)
+            if self._is_unchanged(path, manifest_entry):
+                results.append({"file": relative_path, "converter": manifest_entry["converter"], "status": "skipped"})
+            else:
+                pending.append((relative_path, path))
+
+        store = RegistryStore(self.database) if self.database is not None else None
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [(relative_path, path, executor.submit(_convert_file, path, self.Classifier, self.cache, self.observer, self.budget))
+                       for relative_path, path in pending]
+            for relative_path, path, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+                result = {"file": relative_path, **result}
+                if result["status"] == "converted" and store is not None:
+                    try:
+                        result["measurements"] = store.load_output(self.Classifier.converter_named(result["converter"])(), path)
+                    except Exception as e:
+                        result.update(status="failed", error=f"Loading into {self.database}: {type(e).__name__}: {e}")
+                if result["status"] == "converted":
+                    manifest[relative_path] = {"sha256": hash_file(path), "converter": result["converter"]}
+                else:
+                    manifest.pop(relative_path, None)
+                results.append(result)
+
+        if store is not None:
+            store.close()
+        self._save_manifest(manifest)
+        results.sort(key=lambda r: r["file"])
+        summary = {
+            "directory": self.directory,
+            "duration": time.perf_counter() - started,
+            "converted": sum(1 for r in results if r["status"] == "converted"),
+            "skipped": sum(1 for r in results if r["status"] == "skipped"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "files": results,
+        }
+        with open(os.path.join(self.directory, self.SummaryFilename), "w", encoding="utf-8") as outfile:
+            json.dump(summary, outfile, indent=2)
+        return summary
+
+    def _find_pdfs(self):
+        for directory, subdirectories, filenames in os.walk(self.directory):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".pdf"):
+                    yield os.path.join(directory, filename)
+
+    def _is_unchanged(self, path, manifest_entry):
+        if self.force or manifest_entry is None:
+            return False
+        converter_class = self.Classifier.converter_named(manifest_entry.get("converter"))
+        if converter_class is None:
+            return False
+        output_filename = converter_class.output_filename(path)
+        if not os.path.exists(output_filename) or os.path.getmtime(output_filename) < os.path.getmtime(path):
+            return False
+        return manifest_entry["sha256"] == hash_file(path)
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.directory, self.ManifestFilename), encoding="utf-8") as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        with open(os.path.join(self.directory, self.ManifestFilename), "w", encoding="utf-8") as outfile:
+            json.dump(manifest, outfile, indent=2, sort_keys=True)
+
+
+# Runs in a worker process, so failures are returned rather than raised. A file the classifier doesn't recognise fails
+# without being converted
+def _convert_file(path, classifier, cache, observer, budget=None):
+    started = time.perf_counter()
+    try:
+        classification = classifier.classify(path)
+    except UnknownDocument as e:
+        return {"status": "failed", "duration": time.perf_counter() - started, "error": str(e)}
+    identity = {"converter": classification.converter.__name__, "variant": classification.variant,
+                "classification_seconds": classification.seconds}
+    try:
+        converter = classification.converter(cache=cache, observer=observer, budget=budget, variant=classification.variant)
+        output_filename = converter.process_and_save_file(path)
+        with open(output_filename) as infile:
+            rows = _count_rows(json.load(infile))
+        result = {**identity, "status": "converted", "duration": time.perf_counter() - started, "rows": rows}
+        if converter.skipped_pages:
+            result["skipped_pages"] = [skipped["page"] for skipped in converter.skipped_pages]
+        return result
+    except Exception as e:
+        return {**identity, "status": "failed", "duration": time.perf_counter() - started, "error": f"{type(e).__name__}: {e}"}
+
+
+# GermanyConverter writes a list of tables, each with its records under "data"; the others write the records directly
+def _count_rows(output):
+    return sum(len(item["data"]) if isinstance(item, dict) and "data" in item else 1 for item in output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert every PDF beneath a directory to JSON")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None, help="number of files to convert at once (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="convert every file, even if it is unchanged since it was last converted")
+    parser.add_argument("--no-cache", action="store_true", help="extract every page afresh, without the page cache")
+    parser.add_argument("--cache-dir", default=None, help=f"location of the page cache (default {PageCache.DefaultDirectory})")
+    parser.add_argument("--page-timeout", type=float, default=None,
+                        help="seconds allowed for finding each page's table before trying cheaper settings, and then skipping the page")
+    parser.add_argument("--document-timeout", type=float, default=None, help="seconds allowed for each document - later pages are skipped")
+    parser.add_argument("--database", default=None, help="load the records of each file converted into this SQLite database")
+    parser.add_argument("--metrics", default=None, help="append events about each document, page and stage to this file as JSON lines")
+    args = parser.parse_args()
+    batch_summary = BatchRunner(args.directory, workers=args.workers, force=args.force,
+                                cache=None if args.no_cache else PageCache(args.cache_dir),
+                                observer=JsonLinesMetricsSink(args.metrics) if args.metrics else None,
+                                budget=TimeBudget(args.page_timeout, args.document_timeout) if args.page_timeout or args.document_timeout else None,
+                                database=args.database).run()
+    print(f"Converted {batch_summary['converted']}, skipped {batch_summary['skipped']}, failed {batch_summary['failed']} "
+          f"in {batch_summary['duration']:.1f}s - see {os.path.join(args.directory, BatchRunner.SummaryFilename)}")
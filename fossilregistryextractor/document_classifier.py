@@ -0,0 +1,97 @@
+import argparse
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass
+
+import pdfplumber as pdfplumber
+
+from .page_analysis import PageAnalysis
+
+
+class UnknownDocument(ValueError):
+    pass
+
+
+# Something cheap to check that marks a PDF as one a converter handles, in a layout variant of its own: keywords that
+# all appear in the text at the top of the first page (with its spacing evened out), and metadata entries that match
+# the given regular expressions. A converter lists its fingerprints in Fingerprints
+@dataclass(frozen=True)
+class Fingerprint:
+    variant: str
+    keywords: tuple = ()
+    metadata: tuple = ()
+
+    def matches(self, header_text, metadata):
+        return all(keyword in header_text for keyword in self.keywords) and \
+            all(re.search(pattern, str(metadata.get(key, ""))) for key, pattern in self.metadata)
+
+    # Where several fingerprints match, the one checking the most wins
+    @property
+    def specificity(self):
+        return len(self.keywords) + len(self.metadata)
+
+
+@dataclass(frozen=True)
+class Classification:
+    converter: type
+    variant: str
+    seconds: float
+
+    def to_dict(self):
+        return {"converter": self.converter.__name__, "variant": self.variant, "seconds": self.seconds}
+
+
+# Chooses the converter for a PDF, and the layout variant, from the converters' fingerprints. Only the PDF's metadata
+# and the top of its first page are read - a fraction of the time a converter's first extract_table takes - so a
+# document no converter recognises fails straight away, rather than partway through conversion with an error about
+# its columns
+class DocumentClassifier:
+    HeaderRegionHeight = 200
+
+    def __init__(self, converters):
+        self.converters = list(converters)
+
+    def converter_named(self, name):
+        return next((c for c in self.converters if c.__name__ == name), None)
+
+    # Raises UnknownDocument if no fingerprint matches, or the file can't be read as a PDF
+    def classify(self, filename):
+        started = time.perf_counter()
+        try:
+            with pdfplumber.open(filename) as pdf:
+                metadata = pdf.metadata
+                header_text = PageAnalysis(pdf.pages[0]).header_text(self.HeaderRegionHeight) if pdf.pages else ""
+        except Exception as e:
+            raise UnknownDocument(f"{filename} can't be read as a PDF - {type(e).__name__}: {e}") from None
+        header_text = " ".join(header_text.split())
+        matches = [(fingerprint, converter) for converter in self.converters for fingerprint in converter.Fingerprints
+                   if fingerprint.matches(header_text, metadata)]
+        if not matches:
+            raise UnknownDocument(f"No converter recognises {filename}, which starts \"{header_text[:80]}\"")
+        fingerprint, converter = max(matches, key=lambda match: match[0].specificity)
+        return Classification(converter, fingerprint.variant, time.perf_counter() - started)
+
+
+def main(argv=None):
+    # Imported here, as the batch module imports this one - and UnknownDocument is the package module's, not __main__'s
+    from .batch import BatchRunner
+    from .document_classifier import UnknownDocument
+
+    parser = argparse.ArgumentParser(description="Print the converter and layout variant for each PDF, and how long choosing took")
+    parser.add_argument("filenames", nargs="+")
+    args = parser.parse_args(argv)
+    unknown = 0
+    for filename in args.filenames:
+        try:
+            result = BatchRunner.Classifier.classify(filename).to_dict()
+        except UnknownDocument as e:
+            unknown = unknown + 1
+            result = {"error": str(e)}
+        print(json.dumps({"file": filename, **result}, ensure_ascii=False))
+    sys.exit(1 if unknown else 0)
+
+
+if __name__ == '__main__':
+    main()
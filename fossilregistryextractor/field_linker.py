@@ -0,0 +1,199 @@
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+# Words that tell neighbouring fields apart, e.g. "Miłosław" and "Miłosław E", or "B 3" and "B 4" (see field_signature)
+Directions = {"n", "s", "e", "w", "ne", "nw", "se", "sw"}
+
+# Letters a decomposition into a base letter and accent doesn't cover
+Transliterations = str.maketrans({"ł": "l", "ß": "ss", "ø": "o", "æ": "ae", "œ": "oe", "đ": "d"})
+
+
+@dataclass(frozen=True)
+class FieldLink:
+    field_id: str
+    name: str
+    confidence: float
+
+
+@dataclass
+class FieldEntity:
+    country: str
+    field_id: str
+    name: str
+    trigrams: frozenset
+    signature: tuple
+    documents: set = field(default_factory=set)
+
+
+# Gives the fields named in records a stable id across report years and documents, though the spelling of a name
+# drifts between editions: "BMB (Barnówko - Mostno - \nBuszewo)" in one year and "BMB (Barnówko - Mostno - Buszewo)"
+# in the next, "Rej. Grabownica Wieś" and "Grabownica Wieś", or letters mangled by a report's fonts.
+#
+# Names are normalised (see normalise_field_name) and a name seen before, once normalised, links to its field with
+# confidence 1. Otherwise the name is compared with the country's fields by their trigrams, and links to the most
+# similar (by the Dice coefficient of the trigrams) if that reaches the threshold - or else becomes a new field. The
+# confidence is the similarity.
+#
+# Rather than comparing each name with every field, the fields are found through an index from each trigram to the
+# fields that have it. A field only reaches the threshold by sharing at least a certain number of the name's
+# trigrams, so it must share one of the name's rarest trigrams (all but that number, less one), and only those
+# trigrams' fields are compared. The common trigrams, whose lists grow with the number of fields, are left out, so
+# linking n names takes close to linear time (see benchmarks/field_linking.py).
+#
+# A field's id is its country and normalised name when first seen. With a filename, the fields are kept between runs,
+# so that the ids stay the same whatever order documents are linked in later.
+class FieldLinker:
+    DefaultThreshold = 0.6
+
+    def __init__(self, filename=None, threshold=DefaultThreshold):
+        self.filename = filename
+        self.threshold = threshold
+        self.entities = {}
+        self._names = {}
+        self._index = defaultdict(list)
+        if filename is not None and os.path.exists(filename):
+            with open(filename, encoding="utf-8") as infile:
+                for d in json.load(infile):
+                    self._add(d["country"], d["id"], d["name"], d["names"])
+
+    def __len__(self):
+        return len(self.entities)
+
+    # The field the name is linked to, or None for a record without one. A document names each of its fields one way,
+    # so a name isn't linked to a field the same document has already named differently
+    def link(self, country, name, document=None):
+        if name is None:
+            return None
+        normalised = normalise_field_name(name)
+        key = (country, normalised)
+        if key in self._names:
+            entity = self.entities[self._names[key]]
+            entity.documents.add(document)
+            return FieldLink(entity.field_id, entity.name, 1.0)
+
+        trigrams = field_trigrams(normalised)
+        entity, similarity = self._best_match(country, trigrams, field_signature(normalised), document)
+        if entity is None:
+            field_id = f"{slug(country)}/{slug(normalised)}"
+            self._add(country, field_id, name, [normalised]).documents.add(document)
+            return FieldLink(field_id, name, 1.0)
+        self._names[key] = entity.field_id
+        entity.documents.add(document)
+        return FieldLink(entity.field_id, entity.name, round(similarity, 3))
+
+    # Adds "Field ID" and "Field confidence" to each record of the document, with the field named by record_field (see
+    # BaseConverter.record_field)
+    def link_records(self, records, record_field, document=None):
+        for record in records:
+            link = self.link(record.get("Country"), record_field(record), document)
+            yield {**record, "Field ID": None if link is None else link.field_id,
+                   "Field confidence": None if link is None else link.confidence}
+
+    def save(self):
+        names = defaultdict(list)
+        for (_, normalised), field_id in self._names.items():
+            names[field_id].append(normalised)
+        with open(self.filename, "w", encoding="utf-8") as outfile:
+            json.dump([{"country": entity.country, "id": entity.field_id, "name": entity.name, "names": names[entity.field_id]}
+                       for entity in self.entities.values()], outfile, ensure_ascii=False, indent=2)
+
+    def _add(self, country, field_id, name, names):
+        normalised = normalise_field_name(name)
+        entity = FieldEntity(country, field_id, name, field_trigrams(normalised), field_signature(normalised))
+        self.entities[field_id] = entity
+        for n in names:
+            self._names[(country, n)] = field_id
+        for trigram in entity.trigrams:
+            self._index[(country, trigram)].append(entity)
+        return entity
+
+    def _best_match(self, country, trigrams, signature, document):
+        if not trigrams:
+            return None, 0.0
+        # Dice >= t needs an overlap of at least t * (|a| + |b|) / 2, and as |b| >= overlap, at least t * |a| / (2 - t)
+        minimum_overlap = max(1, math.ceil(self.threshold * len(trigrams) / (2 - self.threshold) - 1e-9))
+        rarest = sorted(trigrams, key=lambda t: len(self._index.get((country, t), ())))
+        best, best_similarity = None, 0.0
+        seen = set()
+        for trigram in rarest[:len(trigrams) - minimum_overlap + 1]:
+            for entity in self._index.get((country, trigram), ()):
+                if entity.field_id in seen:
+                    continue
+                seen.add(entity.field_id)
+                if entity.signature != signature or (document is not None and document in entity.documents):
+                    continue
+                similarity = 2 * len(trigrams & entity.trigrams) / (len(trigrams) + len(entity.trigrams))
+                if similarity > best_similarity:
+                    best, best_similarity = entity, similarity
+        if best_similarity < self.threshold:
+            return None, best_similarity
+        return best, best_similarity
+
+
+# Lowercase, without accents, punctuation or "Rej." (region) and with the spacing evened out.
+#
+# The fonts of Poland's 2015 report map "ż" to "Ŝ" and "Ż" to "ś" in the extracted text ("ElŜbieciny", "śarnowiec"),
+# so these are put back first - a name can't start with a lowercase "ś" otherwise
+def normalise_field_name(name):
+    name = name.replace("Ŝ", "ż")
+    name = re.sub(r"(^|[\s(\-])ś", r"\1Ż", name)
+    name = unicodedata.normalize("NFKD", name.casefold().translate(Transliterations))
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"\brej\.", " ", name)
+    name = re.sub(r"[^\w]+|_", " ", name)
+    return " ".join(name.split())
+
+
+def field_trigrams(normalised):
+    padded = f"  {normalised} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2)) if normalised else frozenset()
+
+
+# Names are only linked when they have the same directions and words with digits, and the same number of words of four letters
+# or more - so "Czarna Wieś" and "Czarna", or "Dzików Stary" and "Dzików", stay apart while "Lipowiec el. E" and
+# "Lipowiec E" are linked
+def field_signature(normalised):
+    words = normalised.split()
+    return (frozenset(word for word in words if word in Directions or any(c.isdigit() for c in word)),
+            sum(1 for word in words if len(word) >= 4 and not word.isdigit()))
+
+
+def slug(text):
+    return re.sub(r"[^\w]+", "-", unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()).strip("-")
+
+
+def main(argv=None):
+    # Imported here, as the batch module imports the converters
+    from .batch import BatchRunner
+    from .document_classifier import UnknownDocument
+
+    parser = argparse.ArgumentParser(description="Link the field names of converted PDFs to stable field ids")
+    parser.add_argument("filenames", nargs="+", help="PDFs, each converted by the converter recognising it")
+    parser.add_argument("--index", help="JSON file of the fields linked so far - read if it exists, and updated")
+    parser.add_argument("--threshold", type=float, default=FieldLinker.DefaultThreshold,
+                        help="the similarity a name needs to link to a known field, from 0 to 1")
+    args = parser.parse_args(argv)
+
+    linker = FieldLinker(args.index, args.threshold)
+    for filename in args.filenames:
+        try:
+            classification = BatchRunner.Classifier.classify(filename)
+        except UnknownDocument as e:
+            print(e, file=sys.stderr)
+            continue
+        converter = classification.converter(variant=classification.variant)
+        for record in linker.link_records(converter.iter_records(filename), converter.record_field, os.path.abspath(filename)):
+            print(json.dumps({"document": filename, **record}, ensure_ascii=False, default=str))
+    if args.index is not None:
+        linker.save()
+
+
+if __name__ == '__main__':
+    main()
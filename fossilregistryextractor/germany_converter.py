@@ -1,11 +1,11 @@
 import json
-import sys
 import re
-
-import pandas as pd
-import pdfplumber as pdfplumber
+from dataclasses import dataclass
 
 from fossilregistryextractor.base_converter import BaseConverter
+from fossilregistryextractor.document_classifier import Fingerprint
+from fossilregistryextractor.records import build_records
+from fossilregistryextractor.table_assembler import TableAssembler
 
 
 # Tables 1 and 2 are exploration drilling and field development drilling - no numbers
@@ -30,120 +30,193 @@ from fossilregistryextractor.base_converter import BaseConverter
 # * Table 24a (Natural gas cavern storage in operation) is interesting
 # * Table 24b (Natural gas cavern storage in planning or under construction) is interesting
 # * Table 25 (Cavern storage for crude oil, petroleum products and liquid gas) is interesting
+
+
+# A table recognised by the keywords in the title at the top of its pages. Its columns are given the headings in
+# order, and the numeric columns are converted to floats. Each row is about the field (or storage site, or region)
+# named in field_column
+@dataclass(frozen=True)
+class TableSpec:
+    purpose: str
+    keywords: tuple
+    headings: tuple
+    numeric_columns: tuple
+    field_column: str
+
+
+StorageCavernHeadings = ("Storage", "State", "Operator", "Number of storage tanks", "Depth", "Geologic formation", "Total volume",
+                         "Max usable gas", "Gas after completion", "Plateau withdrawal rate")
+# Bundesland/Gebiet; Reserven am 1. Januar 2020: sicher, wahrsch, gesamt; Produktion 2020; Reserven am 1. Januar 2021: sicher, wahrsch, gesamt
+ReservesHeadings = ("State/Territory", "Certain reserves 2020", "Probable reserves 2020", "Total reserves 2020", "Production 2020",
+                    "Certain reserves 2021", "Probable reserves 2021", "Total reserves 2021")
+
+# Checked in order - the first spec whose keywords all appear in the title matches
+TableSpecs = (
+    # Erdgas Kavernenspeicher - Natural gas stored in caverns
+    # "In Betrieb" is in operation, "In Planung oder Bau" is in planning or construction
+    # "Speicher", "Bundesland", "Betreiber / Eigentümer", "Anzahl Einzelspeicher", "Teufe", "Speicher formation", "Gesamt volumen", "max. nutzbares Arbeitsgas", "Arbeitsgas nach Endausbau", "Plateau-Entnahmerate"
+    TableSpec("Natural gas storage caverns (operating)", ("Erdgas", "Kavernenspeicher", "In Betrieb"), StorageCavernHeadings,
+              ("Number of storage tanks", "Total volume", "Max usable gas", "Gas after completion", "Plateau withdrawal rate"), "Storage"),
+    TableSpec("Natural gas storage caverns (planned)", ("Erdgas", "Kavernenspeicher", "In Planung"), StorageCavernHeadings,
+              ("Number of storage tanks", "Total volume", "Max usable gas", "Gas after completion", "Plateau withdrawal rate"), "Storage"),
+    # Mineralölprodukte Kavernenspeicher - Crude oil, petroleum products and liquid gas stored in caverns
+    # "Speicher", "Bundesland", "Gesellschaft", "Speichertyp", "Teufe", "Anzahl Einzelspeicher", "Füllung", "Zustand"
+    TableSpec("Crude oil, petroleum products and liquid gas storage caverns", ("Mineralölprodukte", "Kavernenspeicher"),
+              ("Storage", "State", "Company", "Storage type", "Depth", "Number of storage tanks", "Filling", "Status"),
+              ("Number of storage tanks",), "Storage"),
+    # Natural gas storage reservoirs
+    # "Speicher", "Bundesland", "Betreiber / Eigentümer", "Speichertyp", "Teufe", "Speicherformation", "Gesamt volumen", "max. nutzbares Arbeitsgas", "Arbeitsgas nach Endausbau", "Plateau-Entnahmerate"
+    TableSpec("Natural gas storage reservoirs", ("Erdgas", "Porenspeicher"),
+              ("Storage", "State", "Operator", "Storage type", "Depth", "Geologic formation", "Total volume", "Max usable gas",
+               "Gas after completion", "Plateau withdrawal rate"),
+              ("Total volume", "Max usable gas", "Gas after completion", "Plateau withdrawal rate"), "Storage"),
+    TableSpec("Clean gas reserves", ("Reingas", "Erdgasreserven"), ReservesHeadings, ReservesHeadings[1:], "State/Territory"),
+    TableSpec("Raw gas reserves", ("Rohgas", "Erdgasreserven"), ReservesHeadings, ReservesHeadings[1:], "State/Territory"),
+    TableSpec("Oil reserves", ("Erdölreserven",), ReservesHeadings, ReservesHeadings[1:], "State/Territory"),
+    # Table 10 (oil production by field) isn't extracted yet - its layout hasn't been checked against the report
+    # Land, Feld, Fundjahr, Operator, Erdölund Kondensatförderung 2020, Erdölund Kondensatförderung kumulativ, Erdölgasförderung 2020, Erdölgasförderung kumulativ, Sonden
+    # Land, Feld, Fundjahr, Operator, Erdgasförderung 2020, Erdgasförderung kumulativ, Sonden
+    # However "Erdgasförderung kumulativ" is not written in order in the PDF - ignoring for now
+    # Goes on to next page!
+    TableSpec("Natural gas production by field", ("Erdgasförderung", "der Felder"),
+              ("Country", "Field", "Year of discovery", "Operator", "Natural gas production 2020", "Probes"),
+              ("Year of discovery", "Natural gas production 2020", "Probes"), "Field"),
+)
+
+SpecsByPurpose = {spec.purpose: spec for spec in TableSpecs}
+
+# A number in a numeric column, once the spaces and commas between its thousands are taken out
+NumberPattern = re.compile(r"\d+(\.\d+)?")
+
+# All the keywords of all the TableSpecs, longest first so that a keyword contained in another (e.g. "Erdgas" in
+# "Erdgasreserven") doesn't hide it. Each match stands for every keyword it contains.
+HeaderKeywords = sorted({k for spec in TableSpecs for k in spec.keywords} | {"Tab", "Fortsetzung"}, key=lambda k: (-len(k), k))
+HeaderKeywordPattern = re.compile("|".join(map(re.escape, HeaderKeywords)))
+ContainedKeywords = {k: {other for other in HeaderKeywords if other in k} for k in HeaderKeywords}
+
+
 class GermanyConverter(BaseConverter):
-    def process_file(self, filename):
-        pdf = pdfplumber.open(filename)
+    # Only the title at the top of a page is needed to decide whether it holds a wanted table, so every page is
+    # screened on the text of this region first and the (much slower) table detection only runs on pages that pass -
+    # both from the same parse of the page (see BaseConverter.analyse_page). The counts of pages screened and
+    # extracted are kept in page_counts and reported in the document_end event
+    HeaderRegionHeight = 150
+    # The LBEG's annual report "Erdöl und Erdgas in der Bundesrepublik Deutschland", by its title - or an extract of
+    # it starting at one of its tables ("Tab. 14 Erdgasförderung ...")
+    Fingerprints = (Fingerprint("annual report", ("Erdöl", "Erdgas", "Bundesrepublik Deutschland")),
+                    Fingerprint("annual report", metadata=(("Title", "Erdöl und Erdgas"),)),
+                    Fingerprint("tables", ("Tab", "Erdgas")),
+                    Fingerprint("tables", ("Tab", "Erdöl")))
 
+    # The JSON output is built as plain records (see records.py) - pandas is only imported for the DataFrame methods
+    def process_file(self, filename):
         all_json = []
+        with self._observe_document(filename) as document:
+            for purpose, records in TableAssembler(combine=self._combine_records).tables(self._iter_page_records(filename, document)):
+                all_json.append({"purpose": purpose, "data": records})
+        with self._observe_stage("serialize"):
+            return json.dumps(all_json, ensure_ascii=False)
+
+    def iter_records(self, filename):
+        with self._observe_document(filename) as document:
+            for purpose, records in TableAssembler(combine=self._combine_records).page_chunks(self._iter_page_records(filename, document)):
+                for record in records:
+                    yield {"purpose": purpose, **record}
+
+    def iter_dataframes(self, filename):
+        with self._observe_document(filename) as document:
+            yield from TableAssembler().page_chunks(self._iter_page_dataframes(filename, document))
+
+    def _iter_page_dataframes(self, filename, document):
+        return self._iter_page_tables(filename, document, "dataframe", self._build_dataframe, self._convert_dataframe)
+
+    def _iter_page_records(self, filename, document):
+        return self._iter_page_tables(filename, document, "records", self._build_records, self._convert_records)
+
+    # Yields the purpose, whether it continues the previous page's table, and the table built and converted with the
+    # given functions (or None if the page has no wanted table) for every page. The counts of pages screened and
+    # extracted, and of rows, are added to the document's report
+    def _iter_page_tables(self, filename, document, stage, build, convert):
+        pages_screened = 0
+        pages_extracted = 0
+        for page in self._iter_pages(filename):
+            pages_screened = pages_screened + 1
+            content = self.analyse_page(page, self.HeaderRegionHeight, self._is_wanted, self._check_table)
+            is_continuation, spec = self._scan_header(content.header_text)
+            if spec is None:
+                self._skip_page(filename, page.page_number, "no wanted table")
+                yield "", is_continuation, None
+                continue
 
-        last_df = None
-        last_purpose = None
-        i = 0
-        for page in pdf.pages:
-            print(f"Processing page {i}")
-            i = i + 1
-            table = page.extract_table()
-            text = page.extract_text()
-            is_continuation = self._is_continuation(text)
-
-            if last_df is not None and not is_continuation:
-                table_as_json_obj = self._to_json(last_df)
-                all_json.append({"purpose": last_purpose, "data": table_as_json_obj})
-                last_df = None
-                last_purpose = None
-
-            purpose = self._identify_table_purpose(text)
-            headings = self._identify_headings(text)
-            if table is not None and purpose != "" and headings:
-                data_rows = self._filter_to_data(table)
-                df = pd.DataFrame(data_rows, columns=headings)
-                df["Country"] = "Germany"
-                df["Country"] = df["Country"].astype("string")
-                self._convert_dataframe_in_place(df)
-
-                if is_continuation:
-                    combined_df = pd.concat([last_df, df])
-                    last_df = combined_df
-                else:
-                    last_df = df
-                    last_purpose = purpose
-
-        pdf.close()
-        return json.dumps(all_json, ensure_ascii=False)
+            pages_extracted = pages_extracted + 1
+            table = content.table
+            if table is None:
+                self._skip_page(filename, page.page_number, "no table found")
+                yield spec.purpose, is_continuation, None
+                continue
+
+            with self._observe_stage(stage, page.page_number):
+                rows = build(table, spec)
+            with self._observe_stage("convert", page.page_number):
+                convert(rows, spec)
+            self._add_rows(len(rows))
+            document["rows"] = document["rows"] + len(rows)
+            yield spec.purpose, is_continuation, rows
+
+        self.page_counts = {"screened": pages_screened, "extracted": pages_extracted}
+        document.update(pages_screened=pages_screened, pages_extracted=pages_extracted)
+
+    @staticmethod
+    def _combine_records(pages):
+        return [record for page in pages for record in page]
+
+    # Whether a table found with the time budget's fallback settings can be converted
+    def _check_table(self, header_text, table):
+        spec = self._scan_header(header_text)[1]
+        self._convert_records(self._build_records(table, spec), spec)
+
+    def record_field(self, record):
+        return record.get(SpecsByPurpose[record["purpose"]].field_column)
+
+    # A page is worth extracting if its title matches one of the TableSpecs
+    def _is_wanted(self, text):
+        return self._scan_header(text)[1] is not None
 
     def process_page(self, page):
-        table = page.extract_table()
-        text = page.extract_text()
-        headings = self._identify_headings(text)
-        data_rows = self._filter_to_data(table)
-        if headings:
-            df = pd.DataFrame(data_rows, columns=headings)
-            df["Country"] = "Germany"
-            df["Country"] = df["Country"].astype("string")
-            return df
+        content = self.analyse_page(page)
+        spec = self._scan_header(content.header_text)[1]
+        if spec is not None:
+            return self._build_dataframe(content.table, spec)
         else:
             return None
 
-    @staticmethod
-    def _identify_headings(text):
-        start = text[0:100]
-        if not "Tab" in start:
-            return []
-
-        # Erdgas Kavernenspeicher - Natural gas stored in caverns
-        # "In Betrieb" is in operation, "In Planung oder Bau" is in planning or construction
-        if "Erdgas" in start and "Kavernenspeicher" in start:
-            # "Speicher", "Bundesland", "Betreiber / Eigentümer", "Anzahl Einzelspeicher", "Teufe", "Speicher formation", "Gesamt volumen", "max. nutzbares Arbeitsgas", "Arbeitsgas nach Endausbau", "Plateau-Entnahmerate"
-            return ["Storage", "State", "Operator", "Number of storage tanks", "Depth", "Geologic formation", "Total volume", "Max usable gas", "Gas after completion", "Plateau withdrawal rate"]
-        # Mineralölprodukte Kavernenspeicher - Crude oil, petroleum products and liquid gas stored in caverns
-        elif "Mineralölprodukte" in start and "Kavernenspeicher" in start:
-            # "Speicher", "Bundesland", "Gesellschaft", "Speichertyp", "Teufe", "Anzahl Einzelspeicher", "Füllung", "Zustand"
-            return ["Storage", "State", "Company", "Storage type", "Depth", "Number of storage tanks", "Filling", "Status"]
-        #  Natural gas storage reservoirs
-        elif "Erdgas" in start and "Porenspeicher" in start:
-            # "Speicher", "Bundesland", "Betreiber / Eigentümer", "Speichertyp", "Teufe", "Speicherformation", "Gesamt volumen", "max. nutzbares Arbeitsgas", "Arbeitsgas nach Endausbau", "Plateau-Entnahmerate"
-            return ["Storage", "State", "Operator", "Storage type", "Depth", "Geologic formation", "Total volume", "Max usable gas", "Gas after completion", "Plateau withdrawal rate"]
-        # Clean gas reserves or Raw gas reserves or Oil reserves
-        elif (("Reingas" in start or "Rohgas" in start) and "Erdgasreserven" in start) or "Erdölreserven" in start:
-            # Bundesland/Gebie; Reserven am 1. Januar 2020: sicher, wahrsch, gesamt; Produktion 2020; Reserven am 1. Januar 2021: sicher, wahrsch, gesamt
-            return [ "State/Territory", "Certain reserves 2020", "Probable reserves 2020", "Total reserves 2020", "Production 2020", "Certain reserves 2021", "Probable reserves 2021", "Total reserves 2021" ]
-        elif "Erdölförderung" in start and "der Felder" in start:
-            # Land, Feld, Fundjahr, Operator, Erdölund Kondensatförderung 2020, Erdölund Kondensatförderung kumulativ, Erdölgasförderung 2020, Erdölgasförderung kumulativ, Sonden
-            return [ "Country", "Field", "Year of discovery", "Operator", "Oil and condensate production 2020", "Oil and condensate production cumulative", "Oil gas production 2020", "Oil gas production cumulative", "Probes" ]
-        elif "Erdgasförderung" in start and "der Felder" in start:
-            # Land, Feld, Fundjahr, Operator, Erdgasförderung 2020, Erdgasförderung kumulativ, Sonden
-            # However "Erdgasförderung kumulativ" is not written in order in the PDF - ignoring for now
-            return [ "Country", "Field", "Year of discovery", "Operator", "Natural gas production 2020", "Probes" ]
-            # Goes on to next page!
-        else:
-            return []
+    def _build_records(self, table, spec):
+        records = build_records(self._filter_to_data(table), spec.headings)
+        for record in records:
+            record["Country"] = "Germany"
+        return records
 
-    @staticmethod
-    def _identify_table_purpose(text):
-        start = text[0:100]
-        if "Erdgas" in start and "Kavernenspeicher" in start and "In Betrieb" in start:
-            return "Natural gas storage caverns (planned)"
-        elif "Erdgas" in start and "Kavernenspeicher" in start and "In Betrieb" in start:
-            return "Natural gas storage caverns (operating)"
-        elif "Mineralölprodukte" in start and "Kavernenspeicher" in start:
-            return "Crude oil, petroleum products and liquid gas storage caverns"
-        elif "Erdgas" in start and "Porenspeicher" in start:
-            return "Natural gas storage reservoirs"
-        elif "Reingas" in start and "Erdgasreserven" in start:
-            return "Clean gas reserves"
-        elif "Rohgas" in start and "Erdgasreserven" in start:
-            return "Raw gas reserves"
-        elif "Erdölreserven" in start:
-            return "Oil reserves"
-        elif "Erdgasförderung" in start and "der Felder" in start:
-            return "Natural gas production by field"
-        else:
-            return ""
+    def _build_dataframe(self, table, spec):
+        import pandas as pd
+
+        data_rows = self._filter_to_data(table)
+        df = pd.DataFrame(data_rows, columns=list(spec.headings))
+        df["Country"] = "Germany"
+        df["Country"] = df["Country"].astype("string")
+        return df
 
+    # Whether the page continues the previous page's table, and the TableSpec its title matches (if any) - found with
+    # a single scan of the start of the text for all the keywords at once
     @staticmethod
-    def _is_continuation(text):
-        start = text[0:100]
-        return "Fortsetzung" in start
+    def _scan_header(text):
+        found = set()
+        for keyword in HeaderKeywordPattern.findall(text[0:100]):
+            found.update(ContainedKeywords[keyword])
+        is_continuation = "Fortsetzung" in found
+        if "Tab" not in found:
+            return is_continuation, None
+        spec = next((spec for spec in TableSpecs if found.issuperset(spec.keywords)), None)
+        return is_continuation, spec
 
     def _filter_to_data(self, table):
         def remove_blanks(row): return [cell for cell in row if cell is not None]
@@ -153,25 +226,42 @@ class GermanyConverter(BaseConverter):
     def any_numeric(self, row):
         return any([self.is_numeric(item) for item in row if item is not None])
 
-    def all_numeric(self, row):
-        return all([self.is_numeric(item) for item in row if item is not None and item!="" and item!="-"])
-
     @staticmethod
     def is_numeric(s):
         return re.match(r"^[\d ,]+$", s) is not None
 
-    @staticmethod
-    def _to_json(dataframe):
-        out = dataframe.to_json(orient="records", date_format="iso")
-        return json.loads(out)
+    @classmethod
+    def _convert_records(cls, records, spec):
+        for c in spec.numeric_columns:
+            numbers = cls._to_floats([record[c] for record in records])
+            if numbers is not None:
+                for record, number in zip(records, numbers):
+                    record[c] = number
 
-    def _convert_dataframe_in_place(self, df):
-        for c in df.columns:
-            if (self.all_numeric(df[c])):
-                df[c] = df[c].replace(r"^-$", None, regex=True) \
-                    .replace(r"[ ,]", "", regex=True) \
-                    .astype("float")
+    @classmethod
+    def _convert_dataframe(cls, df, spec):
+        for c in spec.numeric_columns:
+            numbers = cls._to_floats(df[c].tolist())
+            if numbers is not None:
+                df[c] = numbers
+                df[c] = df[c].astype("float")
+
+    # Numbers are written with spaces or commas between the thousands, and "-" (or nothing) for none. A numeric column
+    # is converted to floats if all its cells are numbers - one with a cell that isn't (e.g. "<1") is left as text, and
+    # None is returned
+    @staticmethod
+    def _to_floats(cells):
+        numbers = []
+        for text in cells:
+            number = None if text is None else text.replace(" ", "").replace(",", "")
+            if number is None or number in ("", "-"):
+                numbers.append(None)
+            elif NumberPattern.fullmatch(number) is not None:
+                numbers.append(float(number))
+            else:
+                return None
+        return numbers
 
 
 if __name__ == '__main__':
-    GermanyConverter().process_and_save_file(sys.argv[1])
+    GermanyConverter.main()
@@ -1,29 +1,89 @@
 import json
 import re
-import sys
-
-import pandas as pd
-import pdfplumber as pdfplumber
 
 from .base_converter import BaseConverter
+from .document_classifier import Fingerprint
+from .records import build_records, iso_timestamp
 
 
 # Extract a table from the first page of a PDF, formatted as the Ghana National Petroleum Corporation files are
 # See test_ghana_conversion.py for an example of the table format
+#
+# The JSON output is built as plain records (see records.py); pandas is only imported for the DataFrame methods
 class GhanaConverter(BaseConverter):
+    FieldColumn = "Field"
+    # e.g. "2018 OCTP PRODUCTION" above the columns "Oil Production", "Associated Gas Production"...
+    Fingerprints = (Fingerprint("monthly production", ("PRODUCTION", "Oil Production", "Period")),)
+
     def process_file(self, filename):
-        table = self._extract_table(filename)
-        table_as_dataframe = self._convert_table(table)
-        table_as_json_obj = self._to_json(table_as_dataframe)
-        return json.dumps(table_as_json_obj, ensure_ascii=False)
+        with self._observe_document(filename) as document:
+            records = self._convert_first_page(filename, self._build_records) or []
+            document["rows"] = len(records)
+            with self._observe_stage("serialize"):
+                return json.dumps(records, ensure_ascii=False)
+
+    def iter_records(self, filename):
+        with self._observe_document(filename) as document:
+            records = self._convert_first_page(filename, self._build_records) or []
+            document["rows"] = len(records)
+            yield from records
+
+    def iter_dataframes(self, filename):
+        with self._observe_document(filename) as document:
+            table_as_dataframe = self._convert_first_page(filename, self._convert_table)
+            if table_as_dataframe is not None:
+                document["rows"] = len(table_as_dataframe)
+                yield None, table_as_dataframe
+
+    # None if the page is skipped (see BaseConverter.extract_page_table). The pages are gone through to the end, so
+    # that the page is reported in a page_end event and released
+    def _convert_first_page(self, filename, convert):
+        converted = None
+        for page in self._iter_pages(filename, 0, 1):
+            table = self.extract_page_table(page, check=self._build_records)
+            if table is None:
+                continue
+            with self._observe_stage("convert", page.page_number):
+                converted = convert(table)
+            self._add_rows(len(converted))
+        return converted
+
+    # The table of the first page, as extract_page_table finds it
+    @classmethod
+    def _extract_table(cls, filename, cache=None):
+        converter = cls(cache=cache)
+        table = None
+        for page in converter._iter_pages(filename, 0, 1):
+            table = converter.extract_page_table(page)
+        return table
+
+    # The records of the table, with the same columns, values and types as _convert_table's DataFrame gives as JSON
+    def _build_records(self, table):
+        field = self._identify_field(table[0][0])
+        columns = [c.replace("\n", "") for c in table[1]]
+        records = build_records(table[2:], columns)
+        for record in records:
+            for column, value in record.items():
+                if column == "Period":
+                    record[column] = iso_timestamp(value)
+                else:
+                    record[column] = self._to_float(value)
+            record["Field"] = field
+            record["Country"] = "Ghana"
+        return records
 
     @staticmethod
-    def _extract_table(filename):
-        pdf = pdfplumber.open(filename)
-        page = pdf.pages[0]
-        return page.extract_table()
+    def _to_float(value):
+        if value is None or value == "-":
+            return None
+        return float(value.replace(",", ""))
 
     def _convert_table(self, table):
+        return self._convert_dataframe(self._build_dataframe(table))
+
+    def _build_dataframe(self, table):
+        import pandas as pd
+
         # First row is the field; using the second row as the column headers and subsequent rows as data
         field = self._identify_field(table[0][0])
         df = pd.DataFrame(table[2:], columns=table[1])
@@ -34,7 +94,10 @@ class GhanaConverter(BaseConverter):
 
         # Remove the newline characters from the column headers
         df.columns = df.columns.str.replace('\n', '')
+        return df
 
+    @staticmethod
+    def _convert_dataframe(df):
         # Convert the Period to a date (e.g. from 'January, 2018' to '2018-01-01')
         df["Period"] = df["Period"].astype("datetime64[ns]")
         # Convert all remaining columns to floats, doing data cleansing on the numbers at the same time
@@ -52,11 +115,6 @@ class GhanaConverter(BaseConverter):
     def _identify_field(header):
         return re.sub("(\\d+|Production|Year|the|for)", "", header, flags=re.IGNORECASE).strip()
 
-    @staticmethod
-    def _to_json(dataframe):
-        out = dataframe.to_json(orient="records", date_format="iso")
-        return json.loads(out)
-
 
 if __name__ == '__main__':
-    GhanaConverter().process_and_save_file(sys.argv[1])
+    GhanaConverter.main()
@@ -0,0 +1,58 @@
+import cProfile
+import json
+import os
+import time
+
+
+# Receives structured events from a converter as it works. Every event carries the name of the converter and the
+# file; the events are:
+#   document_start, document_end - with the duration and rows produced (and error, if the conversion failed)
+#   page_start, page_end         - with the page number, the duration and the rows produced from the page
+#   stage                        - a stage (open, extract_table, extract_text, records, dataframe, convert, serialize) and its duration
+#   page_skipped                 - a page left out of the output, and the reason
+#   page_timeout                 - an attempt at a page's table that ran out of time, with the table settings tried
+#   page_fallback_rejected       - a table found with fallback settings that the converter couldn't convert, and the error
+# This default ignores them all - override event to collect them.
+class Observer:
+    def event(self, name, **fields):
+        pass
+
+
+# Writes each event as a line of JSON, with the time and the process it came from. It can be passed to the worker
+# processes of a parallel or batch run - each reopens the file to append to it.
+class JsonLinesMetricsSink(Observer):
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+    def event(self, name, **fields):
+        if self._file is None:
+            self._file = open(self.filename, "a", encoding="utf-8")
+        self._file.write(json.dumps({"event": name, "time": time.time(), "pid": os.getpid(), **fields}, ensure_ascii=False, default=str))
+        self._file.write("\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Profiles everything run inside it with cProfile, writing the statistics to a file for pstats (or snakeviz etc.)
+class ProfileCapture:
+    def __init__(self, filename):
+        self.filename = filename
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.profile.dump_stats(self.filename)
@@ -0,0 +1,77 @@
+import bisect
+from dataclasses import dataclass
+
+from pdfplumber.table import TableSettings
+from pdfplumber.utils import DEFAULT_X_TOLERANCE, DEFAULT_Y_TOLERANCE, crop_to_bbox, extract_text
+
+
+# The text and table of a page, from a single parse of its objects.
+#
+# pdfplumber's own page.crop(bbox).extract_text() copies every object on the page to crop it, and page.extract_table()
+# gets the text of each row of the table by testing every character on the page against it. Here the page's characters
+# are gone through once for the text of a region, and once for the whole table - each is placed in its cell by looking
+# up its position in the grid of cell boundaries - with the same results as pdfplumber's
+class PageAnalysis:
+    def __init__(self, page):
+        self.page = page
+        self._tables = {}
+
+    # The text of the region of the page, or of the whole page - as page.crop(bbox).extract_text() would give it
+    def text(self, bbox=None):
+        if bbox is None:
+            return extract_text(self.page.chars)
+        x0, top, x1, bottom = bbox
+        chars = [c for c in self.page.chars if c["top"] < bottom and c["bottom"] > top]
+        return extract_text(crop_to_bbox(chars, bbox))
+
+    # The text of the top of the page
+    def header_text(self, height):
+        x0, top, x1, bottom = self.page.bbox
+        return self.text((x0, top, x1, min(bottom, top + height)))
+
+    def tables(self, table_settings=None):
+        key = repr(table_settings)
+        if key not in self._tables:
+            self._tables[key] = self.page.find_tables(table_settings)
+        return self._tables[key]
+
+    # The largest table on the page, as page.extract_table() would give it - or None if there isn't one. Its cells'
+    # text is extracted with the settings' text_x_tolerance and text_y_tolerance, as pdfplumber's is
+    def table(self, table_settings=None):
+        tables = self.tables(table_settings)
+        if not tables:
+            return None
+        largest = sorted(tables, key=lambda t: (-len(t.cells), t.bbox[1], t.bbox[0]))[0]
+        settings = TableSettings.resolve(table_settings)
+        return extract_cells(largest, self.page.chars, settings.text_x_tolerance, settings.text_y_tolerance)
+
+
+# The text of each cell of a pdfplumber Table, laid out as Table.extract() gives it. A character belongs to every cell
+# its centre is in - cells can overlap - found from the grid of all the cells' boundaries
+def extract_cells(table, chars, x_tolerance=DEFAULT_X_TOLERANCE, y_tolerance=DEFAULT_Y_TOLERANCE):
+    xs = sorted({x for cell in table.cells for x in (cell[0], cell[2])})
+    ys = sorted({y for cell in table.cells for y in (cell[1], cell[3])})
+    cells_at = {}
+    for cell in table.cells:
+        for i in range(bisect.bisect_left(xs, cell[0]), bisect.bisect_left(xs, cell[2])):
+            for j in range(bisect.bisect_left(ys, cell[1]), bisect.bisect_left(ys, cell[3])):
+                cells_at.setdefault((i, j), []).append(cell)
+
+    cell_chars = {}
+    for char in chars:
+        h_mid = (char["x0"] + char["x1"]) / 2
+        v_mid = (char["top"] + char["bottom"]) / 2
+        i = bisect.bisect_right(xs, h_mid) - 1
+        j = bisect.bisect_right(ys, v_mid) - 1
+        for cell in cells_at.get((i, j), ()):
+            cell_chars.setdefault(cell, []).append(char)
+
+    return [[None if cell is None else extract_text(cell_chars[cell], x_tolerance=x_tolerance, y_tolerance=y_tolerance).strip() if cell in cell_chars else ""
+             for cell in row.cells] for row in table.rows]
+
+
+# What a converter needs from a page: the text at its top, and its table if it has a wanted one
+@dataclass
+class PageContent:
+    header_text: str
+    table: list
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import weakref
+
+import pdfplumber as pdfplumber
+
+
+def hash_stream(stream):
+    position = stream.tell()
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+def hash_file(filename):
+    with open(filename, "rb") as stream:
+        return hash_stream(stream)
+
+
+# On-disk cache of the raw results of pdfplumber's extract_table() and extract_text(), one entry per page.
+# Entries are keyed on the content of the PDF rather than its name, together with the page number, the region of the
+# page, the extraction settings and the pdfplumber version - so a re-issued report only re-extracts its changed pages,
+# and upgrading pdfplumber starts afresh. Reading an entry marks it as recently used; once the entries take up more
+# than max_bytes the least recently used ones are removed.
+class PageCache:
+    DefaultDirectory = os.path.join(os.path.expanduser("~"), ".cache", "fossilregistryextractor")
+    DefaultMaxBytes = 512 * 1024 * 1024
+
+    def __init__(self, directory=None, max_bytes=DefaultMaxBytes):
+        self.directory = directory or os.environ.get("FOSSILREGISTRY_CACHE_DIR") or self.DefaultDirectory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._document_hashes = weakref.WeakKeyDictionary()
+
+    # The hashes of open documents are only worth keeping in this process, and can't be pickled for worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_document_hashes"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._document_hashes = weakref.WeakKeyDictionary()
+
+    # extract is what to call to extract the table if it isn't in the cache, if not page.extract_table(table_settings)
+    def extract_table(self, page, table_settings=None, extract=None):
+        return self._get_or_extract(page, "table", table_settings, extract or (lambda: page.extract_table(table_settings)))
+
+    # settings tells apart different extractions of text from the same page, made by extract
+    def extract_text(self, page, settings=None, extract=None):
+        return self._get_or_extract(page, "text", settings, extract or page.extract_text)
+
+    def extract_template_table(self, page, template):
+        return self._get_or_extract(page, "template_table", template.to_dict(), lambda: template.extract_table(page))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = None
+
+    def _get_or_extract(self, page, kind, settings, extract):
+        key = self._key(page, kind, settings)
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as infile:
+                entry = json.load(infile)
+            os.utime(path)
+            self.hits = self.hits + 1
+            return entry["value"]
+        except (OSError, ValueError):
+            pass
+
+        self.misses = self.misses + 1
+        value = extract()
+        self._store(path, {"value": value})
+        return value
+
+    def _key(self, page, kind, settings):
+        identity = [self._document_hash(page.pdf), page.page_number, [round(n, 2) for n in page.bbox], kind,
+                    settings, pdfplumber.__version__]
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _document_hash(self, pdf):
+        if pdf not in self._document_hashes:
+            self._document_hashes[pdf] = hash_stream(pdf.stream)
+        return self._document_hashes[pdf]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[0:2], key + ".json")
+
+    # Written to a temporary file and renamed, so that concurrent processes never read a partial entry
+    def _store(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            json.dump(entry, outfile, ensure_ascii=False)
+        os.replace(temporary_path, path)
+
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size = self._size + os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._size = self._size - size
+            except OSError:
+                pass
+
+    def _entries(self):
+        for directory, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    path = os.path.join(directory, filename)
+                    try:
+                        status = os.stat(path)
+                    except OSError:
+                        continue
+                    yield status.st_mtime, path, status.st_size
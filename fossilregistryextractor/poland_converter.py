@@ -1,44 +1,216 @@
 import json
-import sys
 import re
-
-import pandas as pd
-import pdfplumber as pdfplumber
+from concurrent.futures import ProcessPoolExecutor
 
 from .base_converter import BaseConverter
+from .document_classifier import Fingerprint
+from .records import build_records
 
 
 # Extract a long table spread across every page of a PDF, formatted as the Poland natural gas files
 # Skips the subheader rows that are just totals for the rows beneath them
+#
+# The JSON and NDJSON output is built as plain records (see records.py); pandas is only imported for the DataFrame
+# methods
 class PolandConverter(BaseConverter):
-    def process_file(self, filename):
-        pdf = pdfplumber.open(filename)
-        dataframes = [self.to_dataframe(p) for p in pdf.pages]
-        pdf.close()
-        combined_dataframe = pd.concat(dataframes)
-        table_as_json_obj = self._to_json(combined_dataframe)
-        return json.dumps(table_as_json_obj, ensure_ascii=False)
+    FieldColumn = "Name of field"
+    # The variants are the layouts in Headers - the 9 column one splits the anticipated resources into their total,
+    # A+B and C
+    Fingerprints = (Fingerprint("9 columns", ("LIST OF NATURAL GAS FIELDS", "Resources", "A+B")),
+                    Fingerprint("7 columns", ("LIST OF NATURAL GAS FIELDS", "Resources")))
+
+    # With workers > 1 the pages are split into contiguous ranges and extracted on a process pool; the results are
+    # concatenated in page order, so the output is identical to the serial path. The values are then converted
+    # once for the whole document
+    def process_file(self, filename, workers=None):
+        with self._observe_document(filename) as document:
+            if workers is not None and workers > 1:
+                pages = self._build_pages_in_parallel(filename, workers)
+            else:
+                pages, self.skipped_pages = self._build_page_range(filename, 0, None)
+            records = self._combine_records(pages)
+            with self._observe_stage("convert"):
+                records = self._convert_records(records)
+            document["rows"] = len(records)
+            with self._observe_stage("serialize"):
+                return json.dumps(records, ensure_ascii=False)
+
+    # A page at a time - each page's distinct cells are parsed afresh, so memory use doesn't grow with the document
+    def iter_records(self, filename):
+        with self._observe_document(filename) as document:
+            for page in self._iter_pages(filename):
+                table = self.extract_page_table(page, check=self._check_table)
+                if table is None:
+                    continue
+                with self._observe_stage("records", page.page_number):
+                    records = self._build_records(table)
+                with self._observe_stage("convert", page.page_number):
+                    records = self._convert_records(records)
+                self._add_rows(len(records))
+                document["rows"] = document["rows"] + len(records)
+                yield from records
+
+    def iter_dataframes(self, filename):
+        with self._observe_document(filename) as document:
+            for page in self._iter_pages(filename):
+                df = self.to_dataframe(page)
+                if df is None:
+                    continue
+                self._add_rows(len(df))
+                document["rows"] = document["rows"] + len(df)
+                yield None, df
+
+    # Each worker opens the PDF itself - pdfplumber objects can't be passed between processes - and returns the
+    # unconverted records of each of its pages, and the pages it skipped
+    def _build_page_range(self, filename, start, end):
+        pages = []
+        for page in self._iter_pages(filename, start, end):
+            table = self.extract_page_table(page, check=self._check_table)
+            if table is None:
+                continue
+            with self._observe_stage("records", page.page_number):
+                records = self._build_records(table)
+            self._add_rows(len(records))
+            pages.append(records)
+        return pages, self.skipped_pages
 
+    def _build_pages_in_parallel(self, filename, workers):
+        ranges = self._page_ranges(self.page_count(filename), workers)
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            futures = [executor.submit(self._build_page_range, filename, start, end) for start, end in ranges]
+            results = [future.result() for future in futures]
+        self.skipped_pages = [skipped for _, skipped_pages in results for skipped in skipped_pages]
+        return [page for pages, _ in results for page in pages]
+
+    @staticmethod
+    def _combine_records(pages):
+        return [record for page in pages for record in page]
+
+    # Splits the pages into up to four ranges per worker, so that a slow range doesn't leave the other workers idle
+    @staticmethod
+    def _page_ranges(page_count, workers):
+        range_count = max(1, min(page_count, workers * 4))
+        size, remainder = divmod(page_count, range_count)
+        ranges = []
+        start = 0
+        for i in range(range_count):
+            end = start + size + (1 if i < remainder else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    # None if the page ran out of time (see BaseConverter.extract_page_table)
     def to_dataframe(self, page):
-        table = page.extract_table()
-        return self._convert_table(table)
+        table = self.extract_page_table(page, check=self._check_table)
+        if table is None:
+            return None
+        with self._observe_stage("dataframe", page.page_number):
+            df = self._build_dataframe(table)
+        with self._observe_stage("convert", page.page_number):
+            return self._convert_dataframe(df)
 
     def _convert_table(self, table):
+        return self._convert_dataframe(self._build_dataframe(table))
+
+    # Whether a table found with the time budget's fallback settings can be converted
+    def _check_table(self, table):
+        self._convert_records(self._build_records(table))
+
+    def _build_records(self, table):
+        data_rows = self._filter_to_data(table)
+        header_row = self._choose_header(data_rows[0])
+        return build_records(data_rows, header_row)
+
+    # Converts the records in place, with the same values as _convert_dataframe gives as JSON. Each distinct cell is
+    # only parsed once, as many cells repeat (e.g. "-"), though every cell gets lists and dicts of its own
+    def _convert_records(self, records):
+        counties = {}
+        values = {}
+        for record in records:
+            record["Country"] = "Poland"
+            status = record["State of development"]
+            record["State of development"] = None if status is None else self.StatusLookup[status]
+            county = record["County"]
+            if county is not None:
+                if county not in counties:
+                    counties[county] = self._convert_county(county)
+                record["County"] = list(counties[county])
+            for column in record:
+                value = record[column]
+                if ("Resources" in column or "Output" in column) and value is not None:
+                    if value not in values:
+                        values[value] = [(v["value"], v["is_subeconomic"]) for v in self._convert_value(value)]
+                    record[column] = [{"value": n, "is_subeconomic": s} for n, s in values[value]]
+        return records
+
+    def _build_dataframe(self, table):
+        import pandas as pd
+
         data_rows = self._filter_to_data(table)
         header_row = self._choose_header(data_rows[0])
+        return pd.DataFrame(data_rows, columns=header_row)
 
-        df = pd.DataFrame(data_rows, columns=header_row)
+    def _convert_dataframe(self, df):
         df["Country"] = "Poland"
         df["Country"] = df["Country"].astype("string")
         # PDF has values like Z, T, K to indicate status
-        df["State of development"] = df["State of development"].apply(self._lookup_status).astype("string")
-        df["County"] = df["County"].apply(self._convert_county)
+        df["State of development"] = self._lookup_statuses(df["State of development"])
+        df["County"] = self._convert_counties(df["County"])
         # "Numeric" values are actually sometimes multiple, and have the letter "s" to indicate subeconomic
         cols_to_convert = list(filter(lambda s: "Resources" in s or "Output" in s, df.columns))
-        for c in cols_to_convert:
-            df[c] = df[c].apply(self._convert_value)
+        for c, values in zip(cols_to_convert, self._convert_values(df[cols_to_convert])):
+            df[c] = values
         return df
 
+    # The column-at-a-time equivalents of _convert_county, _convert_value and _lookup_status below, which parse with
+    # pandas string operations over every line of every cell at once rather than with Python calls per cell. Each
+    # distinct cell is only parsed once, as many cells repeat (e.g. "-"). Cells missing from a page (NaN) stay missing
+
+    @classmethod
+    def _convert_counties(cls, column):
+        import pandas as pd
+
+        codes, cells = pd.factorize(column.to_numpy())
+        counties = pd.Series(cells).str.replace("\n", "", regex=False).str.replace("-", "", regex=False).str.split(",").explode()
+        parsed = cls._regroup(counties.str.strip().tolist(), counties.index, len(cells))
+        return pd.Series([list(parsed[code]) if code >= 0 else None for code in codes.tolist()], index=column.index, dtype="object")
+
+    ValueLinePattern = re.compile(r"[\ds-]")
+    NonNumericPattern = re.compile(r"[^\d.-]")
+
+    # Returns a Series of the lists of {"value", "is_subeconomic"} for each of the columns of the frame
+    @classmethod
+    def _convert_values(cls, frame):
+        import pandas as pd
+
+        codes, cells = pd.factorize(frame.to_numpy().ravel(order="F"))
+        lines = pd.Series(cells, dtype="object").str.split("\n").explode()
+        lines = lines[lines.str.contains(cls.ValueLinePattern, na=False)]
+        numbers = pd.to_numeric(lines.str.replace(cls.NonNumericPattern, "", regex=True), errors="coerce").astype("float")
+        is_subeconomic = lines.str.contains("s", regex=False)
+        pairs = [(None if n != n else n, s) for n, s in zip(numbers.tolist(), is_subeconomic.tolist())]
+        parsed = cls._regroup(pairs, lines.index, len(cells))
+
+        # Every cell gets lists and dicts of its own, even where the same cell appears more than once
+        values = [[{"value": n, "is_subeconomic": s} for n, s in parsed[code]] if code >= 0 else None for code in codes.tolist()]
+        rows = len(frame)
+        return [pd.Series(values[i * rows:(i + 1) * rows], index=frame.index, dtype="object") for i in range(len(frame.columns))]
+
+    # Gathers the items exploded out of each cell back into a list per cell, in their original order
+    @staticmethod
+    def _regroup(items, positions, length):
+        cells = [[] for _ in range(length)]
+        for position, item in zip(positions.tolist(), items):
+            cells[position].append(item)
+        return cells
+
+    def _lookup_statuses(self, column):
+        statuses = column.astype("category").map(self.StatusLookup)
+        unknown = statuses.isna() & column.notna()
+        if unknown.any():
+            raise KeyError(column[unknown].iloc[0])
+        return statuses.astype("string")
+
     @staticmethod
     def _convert_county(counties):
         return list(map(lambda s: s.strip(), counties.replace("\n", "").replace("-", "").split(",")))
@@ -59,17 +231,31 @@ class PolandConverter(BaseConverter):
         values = filter(lambda s: re.search(r"[\ds-]", s), value.split("\n"))
         return list(map(convert_fn, values))
 
-    # Identify which set of headers is being used - it is hard to retrieve these automatically because of the
-    # various merged columns
-    @staticmethod
-    def _choose_header(first_data_row):
-        if len(first_data_row) == 7:
-            return ["Number", "Name of field", "State of development", "Resources anticipated economic", "Resources economic", "Output", "County"]
-        elif len(first_data_row) == 9:
-            return ["Number", "Name of field", "State of development", "Resources anticipated Total",
-                    "Resources anticipated A+B", "Resources anticipated C", "Resources economic", "Output", "County"]
-        else:
-            raise Exception(f"Unexpected number of columns {len(first_data_row)} - check definition of headers and adjust")
+    # The headers of each layout variant - it is hard to retrieve these automatically because of the various merged
+    # columns
+    Headers = {
+        "7 columns": ["Number", "Name of field", "State of development", "Resources anticipated economic", "Resources economic", "Output", "County"],
+        "9 columns": ["Number", "Name of field", "State of development", "Resources anticipated Total",
+                      "Resources anticipated A+B", "Resources anticipated C", "Resources economic", "Output", "County"],
+    }
+
+    # The headers of the variant the document was classified as, or else of the variant with as many columns as the
+    # first row
+    def _choose_header(self, first_data_row):
+        variant = self.variant if self.variant is not None else f"{len(first_data_row)} columns"
+        header = self.Headers.get(variant)
+        if header is None or len(header) != len(first_data_row):
+            raise Exception(f"Unexpected number of columns {len(first_data_row)} for {variant} - check definition of headers and adjust")
+        return header
+
+    @classmethod
+    def argument_parser(cls):
+        parser = super().argument_parser()
+        parser.add_argument("--workers", type=int, default=None, help="number of processes to convert pages in parallel (JSON output only)")
+        return parser
+
+    def process_options(self, args):
+        return {"workers": args.workers}
 
     StatusLookup = {
         "B": "Building Mine or Prepared or Trial",  # for solid minerals - mine in a building process, for fuels - prepared for the exploitation or a trial period of the exploitation
@@ -91,11 +277,6 @@ class PolandConverter(BaseConverter):
         def remove_blanks(row): return [cell for cell in row if cell is not None]
         return [remove_blanks(row) for row in table if row[-1] is not None and row[-1] != '' and row[0] is not None and row[0] != '']
 
-    @staticmethod
-    def _to_json(dataframe):
-        out = dataframe.to_json(orient="records", date_format="iso")
-        return json.loads(out)
-
 
 if __name__ == '__main__':
-    PolandConverter().process_and_save_file(sys.argv[1])
+    PolandConverter.main()
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+# Builds the output records straight from the lists of cells that pdfplumber extracts, in plain Python. The values and
+# their types are the same as going through a pandas DataFrame and DataFrame.to_json, but without importing pandas -
+# which takes most of the start-up time of a converter run on a single file, or of each worker process.
+
+# Formats dates are commonly written in, tried before falling back to pandas' more general date parser. Dates with
+# slashes are month first, as pandas reads them
+DateFormats = ("%B, %Y", "%B %Y", "%b, %Y", "%b %Y", "%Y-%m-%d", "%m/%d/%Y")
+
+
+# The rows as records with the given keys, as pd.DataFrame(rows, columns=columns) would have them - short rows are
+# padded with None, and rows longer than the columns are an error
+def build_records(rows, columns):
+    records = []
+    for row in rows:
+        if len(row) > len(columns):
+            raise ValueError(f"{len(columns)} columns passed, passed data had {len(row)} columns")
+        records.append(dict(zip(columns, list(row) + [None] * (len(columns) - len(row)))))
+    return records
+
+
+# A date as DataFrame.to_json(date_format="iso") writes it, e.g. "January, 2018" to "2018-01-01T00:00:00.000"
+def iso_timestamp(text):
+    if text is None:
+        return None
+    for date_format in DateFormats:
+        try:
+            timestamp = datetime.strptime(text.strip(), date_format)
+            break
+        except ValueError:
+            pass
+    else:
+        import pandas as pd
+
+        timestamp = pd.Timestamp(text)
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.") + f"{timestamp.microsecond // 1000:03d}"
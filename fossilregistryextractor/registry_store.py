@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from .page_cache import hash_file
+
+# Loads the converters' records into a SQLite database, so that questions across every document (e.g. the production
+# of a field over the years) are answered with an indexed query rather than by reading every JSON file.
+#
+# Each number in a record is stored as a measurement: the document it came from, the country, the field (see
+# BaseConverter.record_field), the period, the metric (the column, prefixed by the table's purpose where a document
+# has several kinds of table) and the value - one for each value of a multi-value cell such as Poland's resources,
+# with whether it is subeconomic. The period is the record's own Period, or else the year in the document's name.
+# Text columns other than the field and country aren't stored.
+#
+# Loading a document again replaces its measurements, in a single transaction.
+Schema = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    converter TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    loaded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS countries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS fields (
+    id INTEGER PRIMARY KEY,
+    country_id INTEGER NOT NULL REFERENCES countries (id),
+    name TEXT NOT NULL,
+    UNIQUE (country_id, name)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    country_id INTEGER NOT NULL REFERENCES countries (id),
+    field_id INTEGER REFERENCES fields (id),
+    period TEXT,
+    metric_id INTEGER NOT NULL REFERENCES metrics (id),
+    value REAL NOT NULL,
+    is_subeconomic INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fields_by_name ON fields (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS measurements_by_field ON measurements (field_id, period);
+CREATE INDEX IF NOT EXISTS measurements_by_country ON measurements (country_id, period);
+CREATE INDEX IF NOT EXISTS measurements_by_period ON measurements (period);
+CREATE INDEX IF NOT EXISTS measurements_by_document ON measurements (document_id);
+CREATE VIEW IF NOT EXISTS records AS
+    SELECT documents.path AS document, countries.name AS country, fields.name AS field, measurements.period,
+           metrics.name AS metric, measurements.value, measurements.is_subeconomic
+    FROM measurements
+    JOIN documents ON documents.id = measurements.document_id
+    JOIN countries ON countries.id = measurements.country_id
+    LEFT JOIN fields ON fields.id = measurements.field_id
+    JOIN metrics ON metrics.id = measurements.metric_id;
+"""
+
+YearPattern = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+
+
+class RegistryStore:
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(Schema)
+        self._ids = {"countries": {}, "metrics": {}, "fields": {}}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # Converts the PDF with the converter and loads its records, returning the number of measurements stored
+    def load_file(self, converter, filename):
+        return self.load(filename, type(converter).__name__, converter.iter_records(filename), converter.record_field)
+
+    # Loads the records from the JSON output a converter has already written for the PDF (see
+    # BaseConverter.process_and_save_file)
+    def load_output(self, converter, filename):
+        with open(converter.output_filename(filename), encoding="utf-8") as infile:
+            output = json.load(infile)
+        return self.load(filename, type(converter).__name__, records_from_output(output), converter.record_field)
+
+    # Replaces the document's measurements with those of the records, returning the number stored
+    def load(self, filename, converter_name, records, record_field):
+        try:
+            return self._load(filename, converter_name, records, record_field)
+        except BaseException:
+            # Ids added in the transaction have been rolled back
+            self._ids = {"countries": {}, "metrics": {}, "fields": {}}
+            raise
+
+    def _load(self, filename, converter_name, records, record_field):
+        path = os.path.abspath(filename)
+        with self.connection:
+            document_id = self.connection.execute(
+                "INSERT INTO documents (path, converter, sha256, loaded_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET converter = excluded.converter, sha256 = excluded.sha256, "
+                "loaded_at = excluded.loaded_at RETURNING id", (path, converter_name, hash_file(filename), time.time())).fetchone()[0]
+            self.connection.execute("DELETE FROM measurements WHERE document_id = ?", (document_id,))
+            rows = ((document_id, self._id("countries", country), None if field is None else self._field_id(country, field), period,
+                     self._id("metrics", metric), value, is_subeconomic)
+                    for country, field, period, metric, value, is_subeconomic
+                    in iter_measurements(records, record_field, document_period(filename)))
+            cursor = self.connection.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return cursor.rowcount
+
+    def remove(self, filename):
+        with self.connection:
+            self.connection.execute("DELETE FROM documents WHERE path = ?", (os.path.abspath(filename),))
+
+    # The measurements matching all the given conditions. field and country match regardless of case; period
+    # matches the periods it starts, e.g. "2018" matches "2018-03-01"; metric is a LIKE pattern
+    def query(self, field=None, country=None, period=None, metric=None, limit=None):
+        conditions = []
+        parameters = []
+        if field is not None:
+            conditions.append("field = ? COLLATE NOCASE")
+            parameters.append(field)
+        if country is not None:
+            conditions.append("country = ? COLLATE NOCASE")
+            parameters.append(country)
+        if period is not None:
+            # A range rather than LIKE, so that the index on period can be used
+            conditions.append("period >= ? AND period < ?")
+            parameters.extend([period, period + "\x7f"])
+        if metric is not None:
+            conditions.append("metric LIKE ?")
+            parameters.append(metric)
+        sql = "SELECT * FROM records"
+        if conditions:
+            sql = sql + " WHERE " + " AND ".join(conditions)
+        sql = sql + " ORDER BY country, field, period, metric"
+        if limit is not None:
+            sql = sql + " LIMIT ?"
+            parameters.append(limit)
+        cursor = self.connection.execute(sql, parameters)
+        columns = [description[0] for description in cursor.description]
+        return [{**dict(zip(columns, row)), "is_subeconomic": bool(row[-1])} for row in cursor]
+
+    def counts(self):
+        return {table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("documents", "countries", "fields", "metrics", "measurements")}
+
+    # The ids of countries and metrics (and of fields, by country and name) are looked up once per store, adding
+    # any that are new
+    def _id(self, table, name):
+        ids = self._ids[table]
+        if name is None:
+            raise ValueError(f"A measurement has no name for its {table} id")
+        if name not in ids:
+            self.connection.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+            ids[name] = self.connection.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+        return ids[name]
+
+    def _field_id(self, country, name):
+        ids = self._ids["fields"]
+        key = (country, name)
+        if key not in ids:
+            country_id = self._id("countries", country)
+            self.connection.execute("INSERT OR IGNORE INTO fields (country_id, name) VALUES (?, ?)", (country_id, name))
+            ids[key] = self.connection.execute("SELECT id FROM fields WHERE country_id = ? AND name = ?", (country_id, name)).fetchone()[0]
+        return ids[key]
+
+
+# The measurements of the records as (country, field, period, metric, value, is_subeconomic)
+def iter_measurements(records, record_field, period=None):
+    for record in records:
+        country = record.get("Country")
+        field = record_field(record)
+        record_period = record.get("Period")
+        record_period = period if record_period is None else record_period[:10]
+        prefix = f"{record['purpose']}: " if record.get("purpose") else ""
+        for column, value in record.items():
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                yield country, field, record_period, prefix + column, float(value), False
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict) and item.get("value") is not None:
+                        yield country, field, record_period, prefix + column, float(item["value"]), bool(item.get("is_subeconomic"))
+
+
+# The year in the document's file name (e.g. natural_gas_2015.pdf), for records without a period of their own
+def document_period(filename):
+    match = YearPattern.search(os.path.basename(filename))
+    return match.group(0) if match else None
+
+
+# The records of a converter's JSON output - GermanyConverter's are grouped in tables, under "data"
+def records_from_output(output):
+    for item in output:
+        if isinstance(item, dict) and "data" in item and "purpose" in item:
+            for record in item["data"]:
+                yield {"purpose": item["purpose"], **record}
+        else:
+            yield item
+
+
+def main(argv=None):
+    # Imported here, as the batch module imports this one
+    from .batch import BatchRunner
+    from .document_classifier import UnknownDocument
+
+    parser = argparse.ArgumentParser(description="Load converted registry records into SQLite, and query them")
+    parser.add_argument("database", help="SQLite database file - created if it doesn't exist")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    load_parser = subparsers.add_parser("load", help="convert PDFs and load their records, replacing any loaded before")
+    load_parser.add_argument("filenames", nargs="+")
+    query_parser = subparsers.add_parser("query", help="print the matching measurements as JSON lines")
+    query_parser.add_argument("--field")
+    query_parser.add_argument("--country")
+    query_parser.add_argument("--period", help="a year, or the start of a date, e.g. 2018 or 2018-03")
+    query_parser.add_argument("--metric", help="a LIKE pattern, e.g. 'Oil%%'")
+    query_parser.add_argument("--limit", type=int)
+    subparsers.add_parser("counts", help="print the number of documents, fields, measurements...")
+    args = parser.parse_args(argv)
+
+    with RegistryStore(args.database) as store:
+        if args.command == "load":
+            for filename in args.filenames:
+                try:
+                    classification = BatchRunner.Classifier.classify(filename)
+                except UnknownDocument as e:
+                    print(e, file=sys.stderr)
+                    continue
+                converter = classification.converter(variant=classification.variant)
+                print(f"{filename}: {store.load_file(converter, filename)} measurements")
+        elif args.command == "query":
+            started = time.perf_counter()
+            rows = store.query(args.field, args.country, args.period, args.metric, args.limit)
+            duration = time.perf_counter() - started
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False))
+            print(f"{len(rows)} measurements in {duration * 1000:.1f}ms", file=sys.stderr)
+        else:
+            print(json.dumps(store.counts()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .batch import BatchRunner
+from .germany_converter import GermanyConverter
+from .ghana_converter import GhanaConverter
+from .page_cache import PageCache
+from .poland_converter import PolandConverter
+from .time_budget import TimeBudget
+
+# The converters that can be asked for by name - otherwise the converter is chosen from the PDF's first page
+Converters = {"ghana": GhanaConverter, "poland": PolandConverter, "germany": GermanyConverter}
+
+
+class QueueFull(Exception):
+    pass
+
+
+# A PDF submitted for conversion. Its records are written to output_filename as NDJSON while it is converted
+class Job:
+    def __init__(self, job_id, converter_class, path, output_filename, upload=False, classification=None):
+        self.id = job_id
+        self.converter_class = converter_class
+        self.classification = classification
+        self.path = path
+        self.output_filename = output_filename
+        self.upload = upload
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.rows = None
+        self.skipped_pages = None
+        self.error = None
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {"job": self.id, "converter": self.converter_class.__name__,
+                "variant": None if self.classification is None else self.classification.variant,
+                "classification_seconds": None if self.classification is None else self.classification.seconds,
+                "status": self.status, "rows": self.rows,
+                "skipped_pages": self.skipped_pages, "error": self.error, "submitted": self.submitted, "started": self.started, "finished": self.finished}
+
+
+# Converts PDFs on a pool of worker processes that are started - and have imported the converters - before the first
+# job arrives, so a job doesn't pay for starting Python. At most queue_size jobs are unfinished at once; submitting
+# another raises QueueFull, rather than letting the backlog (and its uploads) grow without bound. The most recent
+# retained_jobs finished jobs are kept, with their output, for their results to be fetched. With a
+# time_budget.TimeBudget, pages that run out of time are left out of a job's results and listed in its skipped_pages.
+class ExtractionService:
+    LatencySamples = 1000
+
+    def __init__(self, workers=None, queue_size=16, cache=None, job_directory=None, retained_jobs=1000, budget=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.cache = cache
+        self.budget = budget
+        self.retained_jobs = retained_jobs
+        self._temporary_directory = tempfile.TemporaryDirectory(prefix="fossilregistry-jobs-") if job_directory is None else None
+        self.job_directory = job_directory or self._temporary_directory.name
+        os.makedirs(self.job_directory, exist_ok=True)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._unfinished = 0
+        self._counts = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0, "rows": 0}
+        self._latencies = deque(maxlen=self.LatencySamples)
+        self._waits = deque(maxlen=self.LatencySamples)
+        self.started = time.time()
+        # Workers are spawned rather than forked, as forking a process with the server's threads running isn't safe
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    # Starts every worker process and waits for them to be ready
+    def warm_up(self):
+        for future in [self._executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    # Queues a PDF for conversion, returning its Job. The converter is the one named, or else chosen from the PDF's
+    # first page by BatchRunner's DocumentClassifier - a PDF it doesn't recognise raises UnknownDocument (a ValueError)
+    # rather than being queued. An upload is a file object holding the PDF, which is copied into the job directory and
+    # deleted with the job
+    def submit(self, path=None, converter=None, upload=None):
+        if converter is not None and converter not in Converters:
+            raise ValueError(f"Unknown converter {converter} - choose from {', '.join(Converters)}")
+        if upload is None and (path is None or not os.path.isfile(path)):
+            raise ValueError(f"No such file: {path}")
+        with self._lock:
+            if self._unfinished >= self.queue_size:
+                self._counts["rejected"] = self._counts["rejected"] + 1
+                raise QueueFull(f"{self._unfinished} jobs are already waiting or running")
+            self._unfinished = self._unfinished + 1
+        job_id = uuid.uuid4().hex
+        upload_path = os.path.join(self.job_directory, job_id + ".pdf") if upload is not None else None
+        try:
+            if upload is not None:
+                path = upload_path
+                with open(path, "wb") as outfile:
+                    shutil.copyfileobj(upload, outfile)
+            classification = BatchRunner.Classifier.classify(path) if converter is None else None
+            converter_class = Converters[converter] if converter is not None else classification.converter
+            job = Job(job_id, converter_class, path, os.path.join(self.job_directory, job_id + ".ndjson"), upload is not None, classification)
+            with self._lock:
+                self._jobs[job_id] = job
+                self._counts["submitted"] = self._counts["submitted"] + 1
+            variant = None if classification is None else classification.variant
+            future = self._executor.submit(_run_job, converter_class, path, job.output_filename, self.cache, self.budget, variant)
+        except BaseException:
+            with self._lock:
+                self._unfinished = self._unfinished - 1
+                self._jobs.pop(job_id, None)
+            if upload_path is not None and os.path.exists(upload_path):
+                os.remove(upload_path)
+            raise
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._refresh(job)
+            return job
+
+    # Yields the job's records as lines of NDJSON as soon as they are written, until the job has finished. If the job
+    # fails, the last line is {"error": ...}
+    def iter_results(self, job, poll_interval=0.05):
+        while not os.path.exists(job.output_filename) and not job.is_finished:
+            time.sleep(poll_interval)
+        if not os.path.exists(job.output_filename):
+            yield json.dumps({"error": job.error}).encode("utf-8") + b"\n"
+            return
+        pending = b""
+        with open(job.output_filename, "rb") as infile:
+            while True:
+                finished = job.is_finished
+                chunk = infile.read()
+                if chunk:
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        yield line + b"\n"
+                elif finished:
+                    break
+                else:
+                    time.sleep(poll_interval)
+        if job.status == "failed":
+            yield json.dumps({"error": job.error}).encode("utf-8") + b"\n"
+
+    # Throughput since the service started, the jobs waiting and running, and percentiles of the time from submission
+    # to the end of conversion (latency) and to its start (wait), over the most recent jobs
+    def stats(self):
+        with self._lock:
+            for job in self._jobs.values():
+                self._refresh(job)
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            uptime = time.time() - self.started
+            return {
+                "uptime": uptime,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._unfinished - running,
+                "running": running,
+                **self._counts,
+                "jobs_per_second": (self._counts["done"] + self._counts["failed"]) / uptime,
+                "rows_per_second": self._counts["rows"] / uptime,
+                "latency": percentiles(self._latencies),
+                "wait": percentiles(self._waits),
+            }
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+
+    # Called by the executor as each job's future completes
+    def _finish(self, job, future):
+        finished = time.time()
+        with self._lock:
+            self._unfinished = self._unfinished - 1
+            if future.cancelled():
+                job.status, job.error = "failed", "cancelled"
+            elif future.exception() is not None:
+                error = future.exception()
+                job.status, job.error = "failed", f"{type(error).__name__}: {error}"
+            else:
+                result = future.result()
+                job.status, job.started, job.rows = "done", result["started"], result["rows"]
+                job.skipped_pages = result["skipped_pages"]
+                self._counts["rows"] = self._counts["rows"] + job.rows
+                self._waits.append(job.started - job.submitted)
+            job.finished = finished
+            self._counts[job.status] = self._counts[job.status] + 1
+            self._latencies.append(job.finished - job.submitted)
+            self._forget_old_jobs()
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self._jobs.values() if job.is_finished]
+        for job in finished[:max(0, len(finished) - self.retained_jobs)]:
+            del self._jobs[job.id]
+            for filename in [job.output_filename] + ([job.path] if job.upload else []):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    # A worker creates the job's output file when it starts on the job
+    @staticmethod
+    def _refresh(job):
+        if job.status == "queued" and os.path.exists(job.output_filename):
+            job.status = "running"
+
+
+# The 50th, 90th and 99th percentiles of the samples (nearest rank), or None for each if there are none
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, (len(ordered) * p - 1) // 100)] if ordered else None for p in (50, 90, 99)}
+
+
+# Runs in a worker process to make sure it has started, with the converters imported
+def _warm_up():
+    return os.getpid()
+
+
+# Runs in a worker process, writing the records as NDJSON a page at a time for them to be streamed while the rest of
+# the document is converted
+def _run_job(converter_class, path, output_filename, cache, budget=None, variant=None):
+    started = time.time()
+    rows = 0
+    converter = converter_class(cache=cache, budget=budget, variant=variant)
+    with open(output_filename, "w", encoding="utf-8") as outfile:
+        for record in converter.iter_records(path):
+            outfile.write(json.dumps(record, ensure_ascii=False))
+            outfile.write("\n")
+            rows = rows + 1
+            if rows % 100 == 0:
+                outfile.flush()
+    return {"started": started, "rows": rows, "skipped_pages": converter.skipped_pages}
+
+
+# The HTTP interface to an ExtractionService (the server's service attribute):
+#   POST /jobs                    - a PDF as the request body (optionally with ?converter=ghana|poland|germany), or
+#                                   {"path": ..., "converter": ...} as JSON for a file the service can read.
+#                                   202 with {"job": id}, 400 if no converter recognises the PDF, or 429 if the
+#                                   queue is full
+#   GET  /jobs/<id>               - the job's status
+#   GET  /jobs/<id>/results       - the records as NDJSON, streamed as they are converted
+#   GET  /stats                   - throughput, queue depth and latency percentiles
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    MaxUploadBytes = 200 * 1024 * 1024
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/jobs":
+            return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.MaxUploadBytes:
+            self.close_connection = True
+            return self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"Uploads are limited to {self.MaxUploadBytes} bytes"})
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if self.headers.get_content_type() == "application/json":
+                request = json.loads(self.rfile.read(length))
+                job = self.service.submit(request["path"], converter=request.get("converter", query.get("converter")))
+            else:
+                job = self.service.submit(converter=query.get("converter"), upload=_LimitedReader(self.rfile, length))
+        # The upload may not have been read, so the connection can't be used for another request
+        except QueueFull as e:
+            self.close_connection = True
+            return self._send_json(HTTPStatus.TOO_MANY_REQUESTS, {"error": str(e)}, {"Retry-After": "1"})
+        except (ValueError, KeyError, TypeError) as e:
+            self.close_connection = True
+            return self._send_json(HTTPStatus.BAD_REQUEST, {"error": f"{type(e).__name__}: {e}"})
+        self._send_json(HTTPStatus.ACCEPTED, {"job": job.id, "status": job.status}, {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if parts == ["stats"]:
+            return self._send_json(HTTPStatus.OK, self.service.stats())
+        job = self.service.job(parts[1]) if len(parts) in (2, 3) and parts[0] == "jobs" else None
+        if job is None or (len(parts) == 3 and parts[2] != "results"):
+            return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+        if len(parts) == 2:
+            return self._send_json(HTTPStatus.OK, job.to_dict())
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for line in self.service.iter_results(job):
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _send_json(self, status, body, headers=None):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# Reads no more than the request's Content-Length from the connection
+class _LimitedReader:
+    def __init__(self, infile, length):
+        self.infile = infile
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.infile.read(size) if size > 0 else b""
+        self.remaining = self.remaining - len(data)
+        return data
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve PDF conversions over HTTP from a pool of warm worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--queue-size", type=int, default=16, help="most jobs waiting or running at once - more are rejected with 429")
+    parser.add_argument("--job-dir", default=None, help="where uploads and results are kept (default: a temporary directory)")
+    parser.add_argument("--no-cache", action="store_true", help="extract every page afresh, without the page cache")
+    parser.add_argument("--cache-dir", default=None, help=f"location of the page cache (default {PageCache.DefaultDirectory})")
+    parser.add_argument("--page-timeout", type=float, default=None,
+                        help="seconds allowed for finding each page's table before trying cheaper settings, and then skipping the page")
+    parser.add_argument("--document-timeout", type=float, default=None, help="seconds allowed for each document - later pages are skipped")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    service = ExtractionService(workers=args.workers, queue_size=args.queue_size, job_directory=args.job_dir,
+                                cache=None if args.no_cache else PageCache(args.cache_dir),
+                                budget=TimeBudget(args.page_timeout, args.document_timeout) if args.page_timeout or args.document_timeout else None)
+    service.warm_up()
+    server = ExtractionServer((args.host, args.port), service, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
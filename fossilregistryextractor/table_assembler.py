@@ -0,0 +1,63 @@
+# Puts together tables that run over several pages, from the rows extracted from each page in turn. Each page is given
+# as its purpose, whether it continues the previous page's table, and its rows as a DataFrame (or None if it has no
+# table); a page that doesn't continue the table ends it.
+#
+# A table's pages are only gathered in a list, and concatenated once when the table ends - rather than concatenating
+# the table so far with each new page, which copies the table again for every page - and tables are yielded as soon as
+# they end, rather than at the end of the document.
+#
+# The rows can also be given some other way, e.g. as lists of records, with a combine function to concatenate them
+class TableAssembler:
+    def __init__(self, combine=None):
+        self.combine = combine or self._concat
+        self.purpose = None
+        self._chunks = []
+        self._open = False
+
+    # Adds a page, returning the (purpose, DataFrame) of the table it ended, or None
+    def add(self, purpose, is_continuation, df):
+        finished = None if is_continuation else self.finish()
+        self._continue(purpose, df)
+        if df is not None:
+            self._chunks.append(df)
+        return finished
+
+    # Ends the current table, returning its (purpose, DataFrame), or None if there isn't one
+    def finish(self):
+        table = (self.purpose, self.combine(self._chunks)) if self._chunks else None
+        self.purpose = None
+        self._chunks = []
+        self._open = False
+        return table
+
+    # Yields each table of the pages as soon as it ends, as (purpose, DataFrame)
+    def tables(self, pages):
+        for purpose, is_continuation, df in pages:
+            finished = self.add(purpose, is_continuation, df)
+            if finished is not None:
+                yield finished
+        finished = self.finish()
+        if finished is not None:
+            yield finished
+
+    # Yields the rows of each page that has any, labelled with the purpose of the table they belong to - for output a
+    # page at a time, without gathering whole tables
+    def page_chunks(self, pages):
+        for purpose, is_continuation, df in pages:
+            if not is_continuation:
+                self.finish()
+            self._continue(purpose, df)
+            if df is not None:
+                yield self.purpose, df
+
+    # pandas is only imported when DataFrames are assembled
+    @staticmethod
+    def _concat(chunks):
+        import pandas as pd
+
+        return pd.concat(chunks)
+
+    def _continue(self, purpose, df):
+        if df is not None and not self._open:
+            self.purpose = purpose
+            self._open = True
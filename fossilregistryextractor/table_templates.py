@@ -0,0 +1,212 @@
+import bisect
+import json
+import os
+from dataclasses import dataclass
+
+from pdfplumber.utils import extract_text
+
+from .page_analysis import extract_cells
+
+# Rulings within this distance of each other (in points) are treated as the same line, as in pdfplumber's own
+# table detection
+Tolerance = 3
+
+
+# The layout of a ruled table that recurs across the pages and files of a document family: the region of the page it
+# takes up and the x positions of its column boundaries.
+#
+# pdfplumber's extract_table() works the table out afresh on every page - merging every ruling on the page into lines,
+# intersecting them into cells, and then testing every character against every row and cell for the text. With the
+# columns already known, extract_table here only needs the page's horizontal rulings for the rows, and places each
+# character straight into its cell. The vertical rulings show where cells have been merged, and the result is laid
+# out as pdfplumber's would be - a merged cell's text at its top left, and None in the rest of it.
+#
+# A page that doesn't fit the template - with rulings where it has no column boundary, or missing one where it has -
+# gives None, so the caller can fall back to full table detection
+@dataclass(frozen=True)
+class TableTemplate:
+    bbox: tuple
+    columns: tuple
+
+    # Finds the largest table on the page (of a page_analysis.PageAnalysis) with pdfplumber's full table detection,
+    # returning what extract_table() would and its template - or None for the template if the layout is one a template can't reproduce exactly
+    @classmethod
+    def detect(cls, analysis):
+        tables = analysis.tables()
+        if not tables:
+            return None, None
+        table = sorted(tables, key=lambda t: (-len(t.cells), t.bbox[1], t.bbox[0]))[0]
+        page = analysis.page
+        extracted = extract_cells(table, page.chars)
+        columns = sorted({round(x, 2) for cell in table.cells for x in (cell[0], cell[2])})
+        template = cls(tuple(round(b, 2) for b in table.bbox), tuple(columns))
+        return extracted, template if template.extract_table(page) == extracted else None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(tuple(d["bbox"]), tuple(d["columns"]))
+
+    def to_dict(self):
+        return {"bbox": list(self.bbox), "columns": list(self.columns)}
+
+    def extract_table(self, page):
+        x0, top, x1, bottom = self.bbox
+        page_x0, page_top, page_x1, page_bottom = page.bbox
+        if x0 < page_x0 - Tolerance or x1 > page_x1 + Tolerance:
+            return None
+
+        left, right = self.columns[0] - Tolerance, self.columns[-1] + Tolerance
+        verticals = {}
+        other_verticals = []
+        horizontals = {}
+        for edge in page.edges:
+            if edge["orientation"] == "v" and left <= edge["x0"] <= right:
+                i = self._column_index(edge["x0"])
+                if i is None:
+                    other_verticals.append((edge["top"], edge["bottom"]))
+                else:
+                    verticals.setdefault(i, []).append((edge["top"], edge["bottom"]))
+            elif edge["orientation"] == "h" and edge["x0"] >= left and edge["x1"] <= right and edge["x1"] - edge["x0"] >= Tolerance:
+                horizontals.setdefault(edge["top"], []).append((edge["x0"], edge["x1"]))
+
+        verticals = {i: self._join(spans) for i, spans in verticals.items()}
+        rows, horizontals = self._snap_rows(horizontals)
+        bands = self._table_bands(rows, verticals)
+        if not bands:
+            return None
+        rows = rows[bands[0]:bands[-1] + 2]
+
+        # Every column boundary must be ruled somewhere in the table, and a ruling across a whole row anywhere else
+        # means a different layout. Shorter marks, such as the edges of shaded backgrounds, don't divide cells
+        if any(not any(line_start < rows[-1] and line_end > rows[0] for line_start, line_end in verticals.get(i, []))
+               for i in range(len(self.columns))):
+            return None
+        if any(top <= rows[r] + Tolerance and bottom >= rows[r + 1] - Tolerance
+               for top, bottom in other_verticals for r in range(len(rows) - 1)):
+            return None
+
+        cells = self._merge_cells(rows, verticals, horizontals)
+        return self._fill_cells(page, rows, cells)
+
+    # The index of the column boundary at x, or None if there isn't one there
+    def _column_index(self, x):
+        i = bisect.bisect_left(self.columns, x - Tolerance)
+        return i if i < len(self.columns) and abs(self.columns[i] - x) <= Tolerance else None
+
+    # Groups the horizontal rulings into the y positions of the row boundaries, each with its joined spans
+    @classmethod
+    def _snap_rows(cls, horizontals):
+        rows = []
+        spans = []
+        for y in sorted(horizontals):
+            if rows and y - rows[-1] <= Tolerance:
+                spans[-1] = spans[-1] + horizontals[y]
+            else:
+                rows.append(y)
+                spans.append(list(horizontals[y]))
+        return rows, [cls._join(s) for s in spans]
+
+    # Joins overlapping or adjacent spans into continuous lines
+    @staticmethod
+    def _join(spans):
+        joined = []
+        for start, end in sorted(spans):
+            if joined and start <= joined[-1][1] + Tolerance:
+                joined[-1][1] = max(joined[-1][1], end)
+            else:
+                joined.append([start, end])
+        return joined
+
+    @staticmethod
+    def _covers(lines, start, end):
+        return any(line_start <= start + Tolerance and line_end >= end - Tolerance for line_start, line_end in lines)
+
+    # The longest run of row bands enclosed by the table's outer column boundaries
+    def _table_bands(self, rows, verticals):
+        outer = (verticals.get(0, []), verticals.get(len(self.columns) - 1, []))
+        best = []
+        run = []
+        for i in range(len(rows) - 1):
+            if all(self._covers(lines, rows[i], rows[i + 1]) for lines in outer):
+                run.append(i)
+                if len(run) > len(best):
+                    best = list(run)
+            else:
+                run = []
+        return best
+
+    # Returns, for each grid cell (row band, column), the grid cell at the top left of the merged cell holding it -
+    # cells are merged with their neighbour where there's no ruling between them
+    def _merge_cells(self, rows, verticals, horizontals):
+        # Rulings are looked up by y position, and rows were snapped from the same positions
+        horizontal_lines = dict(zip(rows, horizontals))
+        origin = {}
+        for r in range(len(rows) - 1):
+            for c in range(len(self.columns) - 1):
+                if c > 0 and not self._covers(verticals.get(c, []), rows[r], rows[r + 1]):
+                    origin[(r, c)] = origin[(r, c - 1)]
+                elif r > 0 and not self._covers(horizontal_lines[rows[r]], self.columns[c], self.columns[c + 1]):
+                    origin[(r, c)] = origin[(r - 1, c)]
+                else:
+                    origin[(r, c)] = (r, c)
+        return origin
+
+    # Places each character in its cell by its centre, as pdfplumber does, and lays the cells out in rows and
+    # columns - leaving out any row or column with no cell starting in it, as pdfplumber would have no cell there
+    def _fill_cells(self, page, rows, origin):
+        chars = {}
+        for char in page.chars:
+            h_mid = (char["x0"] + char["x1"]) / 2
+            v_mid = (char["top"] + char["bottom"]) / 2
+            r = bisect.bisect_right(rows, v_mid) - 1
+            c = bisect.bisect_right(self.columns, h_mid) - 1
+            if 0 <= r < len(rows) - 1 and 0 <= c < len(self.columns) - 1:
+                chars.setdefault(origin[(r, c)], []).append(char)
+
+        starts = {cell for cell in origin.values()}
+        row_indexes = sorted({r for r, _ in starts})
+        column_indexes = sorted({c for _, c in starts})
+        return [[(extract_text(chars[(r, c)]).strip() if (r, c) in chars else "") if (r, c) in starts else None
+                 for c in column_indexes] for r in row_indexes]
+
+
+# The templates learned (or declared) for each document family - e.g. each converter - kept in a JSON file between
+# runs if a filename is given. A family can have several layouts, such as different years' reports, so up to
+# max_templates are kept for each, the most recently used first
+class TemplateStore:
+    DefaultMaxTemplates = 8
+
+    def __init__(self, filename=None, templates=None, max_templates=DefaultMaxTemplates):
+        self.filename = filename
+        self.max_templates = max_templates
+        self.templates = {family: list(family_templates) for family, family_templates in (templates or {}).items()}
+        self.hits = 0
+        self.misses = 0
+        if filename is not None and os.path.exists(filename):
+            with open(filename, encoding="utf-8") as infile:
+                for family, family_templates in json.load(infile).items():
+                    self.templates.setdefault(family, []).extend(TableTemplate.from_dict(d) for d in family_templates)
+
+    def candidates(self, family):
+        return list(self.templates.get(family, []))
+
+    # Moves the template to the front of its family's list, adding it if it's new
+    def use(self, family, template):
+        family_templates = self.templates.setdefault(family, [])
+        if template in family_templates:
+            family_templates.remove(template)
+        family_templates.insert(0, template)
+        del family_templates[self.max_templates:]
+
+    # Extracts the table of the page_analysis.PageAnalysis with full table detection, and keeps its template for the
+    # family's later pages. The detection is called by run, if given (e.g. TimeBudget.call)
+    def detect(self, family, analysis, run=None):
+        def detect(): return TableTemplate.detect(analysis)
+        table, template = detect() if run is None else run(detect)
+        if template is not None:
+            self.use(family, template)
+        return table
+
+    def save(self):
+        with open(self.filename, "w", encoding="utf-8") as outfile:
+            json.dump({family: [t.to_dict() for t in family_templates] for family, family_templates in self.templates.items()}, outfile, indent=2)
@@ -0,0 +1,85 @@
+import multiprocessing
+import time
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+# Limits on the time spent extracting each page's table, and on the whole document. A page with thousands of tiny
+# vector lines can keep pdfplumber's table detection busy for minutes, so with a page budget the detection runs in a
+# forked copy of the process, which is killed when the time is up (see BaseConverter.extract_page_table). Where
+# processes can't be forked (Windows) the page budget isn't enforced, though the document budget still is.
+#
+# The document budget runs from when the first page is read - in each worker process, for documents split across
+# several (PolandConverter's workers option)
+class TimeBudget:
+    # Tried in turn on a page that runs out of time. The slow pages are usually covered in tiny lines (hatching,
+    # dotted rules), which the first leaves out before looking for the table's rulings; the text strategy finds the
+    # table from the alignment of the words rather than from any lines drawn
+    DefaultFallbackTableSettings = ({"edge_min_length": 10}, {"vertical_strategy": "text", "horizontal_strategy": "text"})
+
+    def __init__(self, page_seconds=None, document_seconds=None, fallback_table_settings=DefaultFallbackTableSettings):
+        self.page_seconds = page_seconds
+        self.document_seconds = document_seconds
+        self.fallback_table_settings = fallback_table_settings
+        self._deadline = None
+
+    def start_document(self):
+        self._deadline = None if self.document_seconds is None else time.monotonic() + self.document_seconds
+
+    def document_exceeded(self):
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    # The time allowed for an attempt at a page - the page budget, cut short by what's left of the document's
+    def attempt_seconds(self):
+        if self._deadline is None:
+            return self.page_seconds
+        remaining = self._deadline - time.monotonic()
+        return remaining if self.page_seconds is None else min(self.page_seconds, remaining)
+
+    # Returns fn(), raising BudgetExceeded if it takes longer than the page's time
+    def call(self, fn):
+        seconds = self.attempt_seconds()
+        if seconds is not None and seconds <= 0:
+            raise BudgetExceeded("The document's time budget has run out")
+        if seconds is None or "fork" not in multiprocessing.get_all_start_methods():
+            return fn()
+        return call_with_timeout(fn, seconds)
+
+
+# Calls fn in a forked child process - which has a copy of everything already parsed from the page - and returns its
+# result, killing the child if it hasn't finished within the time. The result is sent back pickled
+def call_with_timeout(fn, seconds):
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_send_result, args=(fn, sender))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(seconds):
+            raise BudgetExceeded(f"Took longer than {seconds:.1f}s")
+        succeeded, result = receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"The extraction process exited with code {process.exitcode}") from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    if not succeeded:
+        raise result
+    return result
+
+
+def _send_result(fn, sender):
+    try:
+        result = (True, fn())
+    except Exception as e:
+        result = (False, e)
+    try:
+        sender.send(result)
+    except Exception as e:
+        # The exception (or result) couldn't be pickled
+        sender.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
@@ -0,0 +1,113 @@
+from abc import abstractmethod, ABC
+
+
+# Output writers, chosen by name with the --format option. JSON is the converters' own output; the CSV, Parquet and
+# Arrow writers go straight from the converters' DataFrames to the file, without encoding and decoding JSON.
+#
+# Cells holding several values (Poland's resources and output, a list of {"value", "is_subeconomic"} per cell) are
+# moved out into a second, long table alongside the main one - one row per value, with the field and column it came
+# from - so that every column of both tables has a single type.
+class JsonWriter:
+    def write(self, converter, filename, **options):
+        return [converter.process_and_save_file(filename, **options)]
+
+
+class NdjsonWriter:
+    def write(self, converter, filename, **options):
+        return [converter.stream_and_save_file(filename)]
+
+
+class DataFrameWriter(ABC):
+    extension = None
+
+    def write(self, converter, filename, **options):
+        table, values = self.flatten(converter, filename)
+        output_filenames = [converter.output_filename(filename, self.extension)]
+        self.write_dataframe(table, output_filenames[0])
+        if values is not None:
+            output_filenames.append(converter.output_filename(filename, ".values" + self.extension))
+            self.write_dataframe(values, output_filenames[1])
+        metadata_filename = converter.save_metadata(filename)
+        return output_filenames + ([metadata_filename] if metadata_filename else [])
+
+    @abstractmethod
+    def write_dataframe(self, df, output_filename):
+        pass
+
+    # Combines the converter's DataFrames into one table (with a purpose column where the document has several kinds
+    # of table), and the long table of any multi-value columns - or None if there are none. A document without any
+    # tables gives an empty table
+    def flatten(self, converter, filename):
+        # pandas is only imported for the DataFrame formats, so that JSON output starts quickly
+        import pandas as pd
+
+        dataframes = []
+        for purpose, df in converter.iter_dataframes(filename):
+            if purpose is not None:
+                df.insert(0, "purpose", purpose)
+            dataframes.append(df)
+        table = pd.concat(dataframes, ignore_index=True) if dataframes else pd.DataFrame()
+
+        value_columns = [c for c in table.columns if self._is_value_column(table[c])]
+        if not value_columns:
+            return table, None
+        values = pd.concat([self._to_long_format(table, c, converter.FieldColumn) for c in value_columns], ignore_index=True)
+        return table.drop(columns=value_columns), values
+
+    @staticmethod
+    def _is_value_column(column):
+        first = next((cell for cell in column if isinstance(cell, list) and cell), None)
+        return isinstance(first, list) and isinstance(first[0], dict) and "value" in first[0]
+
+    @staticmethod
+    def _to_long_format(table, column, field_column):
+        import pandas as pd
+
+        exploded = table[[field_column, column]].explode(column).dropna(subset=[column])
+        return pd.DataFrame({
+            "field": exploded[field_column].astype("string").to_numpy(),
+            "column": pd.Series(column, index=range(len(exploded)), dtype="string"),
+            "value": pd.Series([v["value"] for v in exploded[column]], dtype="float"),
+            "is_subeconomic": pd.Series([v["is_subeconomic"] for v in exploded[column]], dtype="bool"),
+        })
+
+
+# Any remaining list cells (e.g. Poland's counties) are joined into a single comma-separated string
+class CsvWriter(DataFrameWriter):
+    extension = ".csv"
+
+    def write_dataframe(self, df, output_filename):
+        df = df.copy()
+        for c in df.columns:
+            if any(isinstance(cell, list) for cell in df[c]):
+                df[c] = df[c].apply(lambda cell: ", ".join(cell) if isinstance(cell, list) else cell)
+        df.to_csv(output_filename, index=False, date_format="%Y-%m-%dT%H:%M:%S")
+
+
+class ParquetWriter(DataFrameWriter):
+    extension = ".parquet"
+
+    def write_dataframe(self, df, output_filename):
+        df.to_parquet(output_filename, index=False)
+
+
+class ArrowWriter(DataFrameWriter):
+    extension = ".arrow"
+
+    def write_dataframe(self, df, output_filename):
+        # pyarrow is only needed for the Arrow and Parquet formats
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(output_filename, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+Writers = {
+    "json": JsonWriter(),
+    "ndjson": NdjsonWriter(),
+    "csv": CsvWriter(),
+    "parquet": ParquetWriter(),
+    "arrow": ArrowWriter(),
+}
@@ -0,0 +1,79 @@
+import zlib
+
+# Writes PDFs with a ruled table on every page, laid out like the Poland natural gas files (seven columns: number,
+# field, state, two resources, output and county), for testing with documents of any number of pages. The first page
+# has the report's title above the table. Slow pages are also covered in thousands of tiny crossed lines, which take
+# pdfplumber's table detection several seconds
+PageWidth = 842
+PageHeight = 595
+ColumnWidths = [40, 140, 60, 120, 120, 100, 200]
+RowHeight = 18
+RowsPerPage = 25
+SlowPageMarks = 4000
+PolandTitle = "Table 3 LIST OF NATURAL GAS FIELDS - Resources (million m3)"
+
+
+def poland_rows(page_index):
+    for row in range(RowsPerPage):
+        number = page_index * RowsPerPage + row + 1
+        yield [str(number), f"Field {number}", "E", f"{number * 1.25:,.2f}", f"{number * 0.75:,.2f}", f"{row}.50", "podkarpackie"]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_content(rows, marks=0, title=None):
+    left = 20
+    top = PageHeight - 40
+    width = sum(ColumnWidths)
+    commands = ["0.5 w"]
+    if title:
+        commands.append(f"BT /F1 10 Tf {left} {PageHeight - 25} Td ({_escape(title)}) Tj ET")
+    for i in range(len(rows) + 1):
+        y = top - i * RowHeight
+        commands.append(f"{left} {y} m {left + width} {y} l S")
+    x = left
+    for column_width in [0] + ColumnWidths:
+        x += column_width
+        commands.append(f"{x} {top} m {x} {top - len(rows) * RowHeight} l S")
+    for i, row in enumerate(rows):
+        x = left
+        for column_width, cell in zip(ColumnWidths, row):
+            commands.append(f"BT /F1 8 Tf {x + 3} {top - (i + 1) * RowHeight + 6} Td ({_escape(cell)}) Tj ET")
+            x += column_width
+    commands.append("0.1 w")
+    columns = int(marks ** 0.5)
+    for i in range(marks):
+        x = left + 10 + (i % columns) * (sum(ColumnWidths) - 20) / columns
+        y = 60 + (i // columns) * (PageHeight - 120) / columns
+        commands.append(f"{x:.2f} {y:.2f} m {x + 3:.2f} {y:.2f} l S {x + 1.5:.2f} {y - 1.5:.2f} m {x + 1.5:.2f} {y + 1.5:.2f} l S")
+    return zlib.compress("\n".join(commands).encode("latin-1"))
+
+
+def write_poland_pdf(filename, page_count, slow_pages=(), title=PolandTitle):
+    # Objects 1-3 are the catalog, page tree and font; each page then has a page object and a content stream
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_index in range(page_count):
+        content = _page_content(list(poland_rows(page_index)), SlowPageMarks if page_index + 1 in slow_pages else 0,
+                                title if page_index == 0 else None)
+        page_ids.append(len(objects) + 1)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PageWidth} {PageHeight}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode("latin-1"))
+        objects.append(f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("latin-1") + content + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {page_count} >>".encode("latin-1")
+
+    with open(filename, "wb") as outfile:
+        outfile.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(outfile.tell())
+            outfile.write(f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+        xref_offset = outfile.tell()
+        outfile.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+        for offset in offsets:
+            outfile.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+        outfile.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1"))
+    return filename
@@ -0,0 +1,78 @@
+import collections
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pdfplumber as pdfplumber
+
+from fossilregistryextractor.poland_converter import PolandConverter
+from synthetic_pdf import RowsPerPage, write_poland_pdf
+
+
+# Converts the file in a process of its own, returning the process's peak RSS in MB
+def convert_and_measure(filename, low_memory):
+    records = collections.deque(enumerate(PolandConverter(low_memory=low_memory).iter_records(filename)), maxlen=1)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return records[0][0] + 1, peak_rss / (1024 * 1024)
+
+
+class TestBaseConverter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.short_filename = write_poland_pdf(os.path.join(cls.directory.name, "short.pdf"), 20)
+        cls.long_filename = write_poland_pdf(os.path.join(cls.directory.name, "long.pdf"), 300)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def measure(self, filename, low_memory):
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            return pool.apply(convert_and_measure, (filename, low_memory))
+
+    def test_low_memory_peak_rss_does_not_grow_with_pages(self):
+        short_records, short_rss = self.measure(self.short_filename, True)
+        long_records, long_rss = self.measure(self.long_filename, True)
+        self.assertEqual(20 * RowsPerPage, short_records)
+        self.assertEqual(300 * RowsPerPage, long_records)
+        self.assertLess(long_rss - short_rss, 2.5)
+
+    def test_low_memory_pages_match_pdf_pages(self):
+        converter = PolandConverter(low_memory=True)
+        with pdfplumber.open(self.short_filename) as pdf:
+            expected = [(p.page_number, p.initial_doctop, p.bbox) for p in pdf.pages[5:8]]
+        actual = [(p.page_number, p.initial_doctop, p.bbox) for p in converter._iter_pages(self.short_filename, 5, 8)]
+        self.assertEqual(expected, actual)
+
+    def test_low_memory_output_is_unchanged(self):
+        self.assertEqual(PolandConverter().process_file(self.short_filename),
+                         PolandConverter(low_memory=True).process_file(self.short_filename))
+
+    def test_pdf_is_closed_on_error(self):
+        opened = []
+
+        def open_and_record(filename):
+            opened.append(pdfplumber.PDF.open(filename))
+            return opened[-1]
+
+        with mock.patch("pdfplumber.open", open_and_record):
+            for low_memory in [False, True]:
+                converter = PolandConverter(low_memory=low_memory)
+                with mock.patch.object(converter, "extract_page_table", side_effect=ValueError("unreadable page")):
+                    with self.assertRaises(ValueError):
+                        converter.process_file(self.short_filename)
+        self.assertEqual(2, len(opened))
+        self.assertTrue(all(pdf.stream.closed for pdf in opened))
+
+    def test_page_count(self):
+        self.assertEqual(300, PolandConverter.page_count(self.long_filename))
+        self.assertEqual(7, PolandConverter.page_count("pdfs/poland/natural_gas_2015.pdf"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fossilregistryextractor.batch import BatchRunner
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.directory.name, "ghana"))
+        os.makedirs(os.path.join(self.directory.name, "poland"))
+        shutil.copy("pdfs/ghana/2018-OCTP-Productions.pdf", os.path.join(self.directory.name, "ghana"))
+        shutil.copy("pdfs/poland/natural_gas_2015.pdf", os.path.join(self.directory.name, "poland"))
+        with open(os.path.join(self.directory.name, "ghana", "broken.pdf"), "wb") as outfile:
+            outfile.write(b"not a PDF")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def statuses(self, summary):
+        return {r["file"]: r["status"] for r in summary["files"]}
+
+    def test_run(self):
+        summary = BatchRunner(self.directory.name, workers=2).run()
+        self.assertEqual({os.path.join("ghana", "2018-OCTP-Productions.pdf"): "converted",
+                          os.path.join("ghana", "broken.pdf"): "failed",
+                          os.path.join("poland", "natural_gas_2015.pdf"): "converted"}, self.statuses(summary))
+        ghana_result = [r for r in summary["files"] if r["file"].endswith("Productions.pdf")][0]
+        self.assertEqual(12, ghana_result["rows"])
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "poland", "natural_gas_2015.json")))
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, BatchRunner.SummaryFilename)))
+
+    def test_skips_unchanged(self):
+        BatchRunner(self.directory.name, workers=2).run()
+        with open(os.path.join(self.directory.name, "poland", "natural_gas_2015.pdf"), "ab") as outfile:
+            outfile.write(b"\n")
+        summary = BatchRunner(self.directory.name, workers=2).run()
+        self.assertEqual("skipped", self.statuses(summary)[os.path.join("ghana", "2018-OCTP-Productions.pdf")])
+        self.assertEqual("converted", self.statuses(summary)[os.path.join("poland", "natural_gas_2015.pdf")])
+        self.assertEqual("failed", self.statuses(summary)[os.path.join("ghana", "broken.pdf")])
+
+    def test_routes_by_content(self):
+        shutil.move(os.path.join(self.directory.name, "poland", "natural_gas_2015.pdf"), os.path.join(self.directory.name, "ghana", "report.pdf"))
+        summary = BatchRunner(self.directory.name, workers=1).run()
+        result = [r for r in summary["files"] if r["file"].endswith("report.pdf")][0]
+        self.assertEqual(("converted", "PolandConverter", "7 columns"), (result["status"], result["converter"], result["variant"]))
+        self.assertGreater(result["classification_seconds"], 0)
+        broken = [r for r in summary["files"] if r["file"].endswith("broken.pdf")][0]
+        self.assertIn("can't be read as a PDF", broken["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from fossilregistryextractor.batch import BatchRunner
+from fossilregistryextractor.document_classifier import Fingerprint, UnknownDocument
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.poland_converter import PolandConverter
+from synthetic_pdf import write_poland_pdf
+
+
+class TestDocumentClassifier(unittest.TestCase):
+    classifier = BatchRunner.Classifier
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_classify(self):
+        for filename, converter, variant in [("pdfs/ghana/2018-OCTP-Productions.pdf", GhanaConverter, "monthly production"),
+                                             ("pdfs/poland/natural_gas_2015.pdf", PolandConverter, "7 columns"),
+                                             ("pdfs/poland/natural_gas_2020.pdf", PolandConverter, "9 columns"),
+                                             (write_poland_pdf(os.path.join(self.directory.name, "report.pdf"), 1), PolandConverter, "7 columns")]:
+            classification = self.classifier.classify(filename)
+            self.assertEqual((converter, variant), (classification.converter, classification.variant), filename)
+            self.assertLess(classification.seconds, 5)
+
+    def test_unknown(self):
+        # Named like a Poland report, but without its title
+        filename = write_poland_pdf(os.path.join(self.directory.name, "natural_gas_2019.pdf"), 1, title=None)
+        with self.assertRaisesRegex(UnknownDocument, "No converter recognises"):
+            self.classifier.classify(filename)
+        with open(filename, "wb") as outfile:
+            outfile.write(b"not a PDF")
+        with self.assertRaisesRegex(UnknownDocument, "can't be read as a PDF"):
+            self.classifier.classify(filename)
+
+    def test_fingerprint(self):
+        header = "Tab. 14 Erdgasförderung der Felder 2020"
+        self.assertTrue(any(f.matches(header, {}) for f in GermanyConverter.Fingerprints))
+        self.assertFalse(any(f.matches(header, {}) for f in PolandConverter.Fingerprints))
+        self.assertTrue(Fingerprint("report", metadata=(("Title", "^Erdöl"),)).matches("", {"Title": "Erdöl und Erdgas 2020"}))
+        self.assertFalse(Fingerprint("report", metadata=(("Title", "^Erdöl"),)).matches("", {}))
+        self.assertEqual("GermanyConverter", self.classifier.converter_named("GermanyConverter").__name__)
+        self.assertIsNone(self.classifier.converter_named("PeruConverter"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from fossilregistryextractor.field_linker import FieldLinker, normalise_field_name
+from fossilregistryextractor.poland_converter import PolandConverter
+
+
+class TestFieldLinker(unittest.TestCase):
+    def test_normalise_field_name(self):
+        self.assertEqual("bmb barnowko mostno buszewo", normalise_field_name("BMB (Barnówko - Mostno - \nBuszewo)"))
+        self.assertEqual("grabownica wies", normalise_field_name("Rej. Grabownica Wieś"))
+        # The 2015 report's fonts
+        self.assertEqual(normalise_field_name("Żołynia-Leżajsk"), normalise_field_name("śołynia-LeŜajsk"))
+        self.assertEqual("slopnice", normalise_field_name("Słopnice"))
+
+    def test_link(self):
+        linker = FieldLinker()
+        first = linker.link("Poland", "Lipowiec el. E", "2015")
+        self.assertEqual(("poland/lipowiec-el-e", 1.0), (first.field_id, first.confidence))
+        self.assertEqual(first, linker.link("Poland", "Lipowiec  el. E", "2015"))
+        second = linker.link("Poland", "Lipowiec E", "2020")
+        self.assertEqual(("poland/lipowiec-el-e", "Lipowiec el. E"), (second.field_id, second.name))
+        self.assertTrue(0.6 <= second.confidence < 1)
+        # Once linked, the spelling is known
+        self.assertEqual(1.0, linker.link("Poland", "Lipowiec E", "2021").confidence)
+
+    def test_distinct_fields(self):
+        linker = FieldLinker()
+        ids = {linker.link("Poland", name, "2020").field_id for name in ["Miłosław", "Czarna", "B 3"]}
+        ids |= {linker.link("Poland", name, "2021").field_id for name in ["Miłosław E", "Czarna Wieś", "B 4", "B 3"]}
+        self.assertEqual(6, len(ids))
+        self.assertNotEqual(linker.link("Poland", "Miłosław", "2020"), linker.link("Ghana", "Miłosław", "2020"))
+        self.assertIsNone(linker.link("Poland", None))
+
+    def test_names_in_one_document_are_distinct(self):
+        linker = FieldLinker()
+        self.assertNotEqual(linker.link("Poland", "Wierzchowice", "2015"), linker.link("Poland", "Wierzchowo", "2015"))
+        self.assertEqual("poland/wierzchowice", linker.link("Poland", "Wierzchowicze", "2020").field_id)
+
+    def test_reports(self):
+        converter = PolandConverter()
+        linker = FieldLinker()
+        records_2015 = list(linker.link_records(converter.iter_records("pdfs/poland/natural_gas_2015.pdf"), converter.record_field, "2015"))
+        records_2020 = list(linker.link_records(converter.iter_records("pdfs/poland/natural_gas_2020.pdf"), converter.record_field, "2020"))
+        by_name = {r["Name of field"]: r["Field ID"] for r in records_2015}
+        linked = {r["Name of field"]: r["Field ID"] for r in records_2020}
+        self.assertEqual(by_name["śarnowiec"], linked["Żarnowiec"])
+        self.assertEqual(by_name["BMB (Barnówko - Mostno - \nBuszewo)"], linked["BMB (Barnówko - Mostno - Buszewo)"])
+        self.assertEqual(by_name["Rej. Grabownica Wieś"], linked["Grabownica Wieś"])
+        self.assertNotEqual(linked["Miłosław"], linked["Miłosław E"])
+        self.assertEqual(309, len(linker))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "fields.json")
+            linker = FieldLinker(filename)
+            linker.link("Poland", "Rej. Grabownica Wieś", "2015")
+            linker.link("Poland", "Grabownica Wies", "2020")
+            linker.save()
+            loaded = FieldLinker(filename)
+            self.assertEqual(1, len(loaded))
+            link = loaded.link("Poland", "Grabownica Wies")
+            self.assertEqual(("poland/grabownica-wies", 1.0), (link.field_id, link.confidence))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
+import json
 import unittest
+
+import pandas as pd
 import pdfplumber
 
 from fossilregistryextractor.germany_converter import GermanyConverter
@@ -20,6 +23,69 @@ class TestGermanyConverter(unittest.TestCase):
         self.assertEqual("Apeldorn", df["Field"][19])
         pdf.close()
 
+    def test_is_wanted(self):
+        self.assertTrue(self.gc._is_wanted("Tab. 14: Erdgasförderung der Felder 2020 (Rohgas ohne Erdölgas)"))
+        self.assertTrue(self.gc._is_wanted("Fortsetzung Tab. 14: Erdgasförderung der Felder 2020"))
+        self.assertFalse(self.gc._is_wanted("Tab. 1: Explorationsbohrungen 2020"))
+        self.assertFalse(self.gc._is_wanted("Erdgasförderung der Felder"))
+
+    def test_scan_header(self):
+        self.assertEqual((False, None), self.gc._scan_header("Tab. 20: Anteile der Energieträger am Primärenergieverbrauch"))
+        is_continuation, spec = self.gc._scan_header("Fortsetzung Tab. 14: Erdgasförderung der Felder 2020")
+        self.assertTrue(is_continuation)
+        self.assertEqual("Natural gas production by field", spec.purpose)
+        self.assertEqual("Raw gas reserves", self.gc._scan_header("Tab. 18: Erdgasreserven (Rohgas) nach Ländern")[1].purpose)
+        self.assertEqual("Natural gas storage caverns (operating)",
+                         self.gc._scan_header("Tab. 24a: Erdgas-Kavernenspeicher - In Betrieb")[1].purpose)
+        self.assertEqual("Natural gas storage caverns (planned)",
+                         self.gc._scan_header("Tab. 24b: Erdgas-Kavernenspeicher - In Planung oder Bau")[1].purpose)
+
+    def test_convert_dataframe(self):
+        table = [["Tab. 18", None, None, None, None, None, None, None],
+                 ["Bayern", "39", "65", "104", "5", "34", "60", "1 094"],
+                 ["Summe", "-", "65", "104", "5", "34", "60", "2,094"]]
+        _, spec = self.gc._scan_header("Tab. 18: Erdgasreserven (Rohgas) nach Ländern")
+        df = self.gc._build_dataframe(table, spec)
+        self.gc._convert_dataframe(df, spec)
+        self.assertEqual("Bayern", df["State/Territory"][0])
+        self.assertEqual(1094.0, df["Total reserves 2021"][0])
+        self.assertEqual(2094.0, df["Total reserves 2021"][1])
+        self.assertTrue(pd.isna(df["Certain reserves 2020"][1]))
+
+    def test_convert_records_matches_convert_dataframe(self):
+        table = [["Bayern", "39", "65", "104", "5", "34", "60", "1 094"],
+                 ["Summe", "-", "", "1,5", "5", "34", "60", None],
+                 ["Hessen", "1", "2"]]
+        _, spec = self.gc._scan_header("Tab. 18: Erdgasreserven (Rohgas) nach Ländern")
+        df = self.gc._build_dataframe(table, spec)
+        self.gc._convert_dataframe(df, spec)
+        records = self.gc._build_records(table, spec)
+        self.gc._convert_records(records, spec)
+        self.assertEqual(self.gc._to_json(df), json.loads(json.dumps(records)))
+
+    def test_numeric_columns_are_floats(self):
+        table = [["Bayern", "39", "65", "104", "5", "34", "60", "1 094"]]
+        _, spec = self.gc._scan_header("Tab. 18: Erdgasreserven (Rohgas) nach Ländern")
+        df = self.gc._build_dataframe(table, spec)
+        self.gc._convert_dataframe(df, spec)
+        records = self.gc._build_records(table, spec)
+        self.gc._convert_records(records, spec)
+        self.assertEqual("float64", str(df["Certain reserves 2020"].dtype))
+        self.assertIsInstance(records[0]["Certain reserves 2020"], float)
+        self.assertIn('"Certain reserves 2020": 39.0', json.dumps(records))
+
+    def test_column_with_text_left_as_text(self):
+        table = [["Bayern", "<1", "65", "104", "5", "34", "60", "1 094"], ["Bremen", "3", "-", "3", "1", "2", "", "2"]]
+        _, spec = self.gc._scan_header("Tab. 18: Erdgasreserven (Rohgas) nach Ländern")
+        df = self.gc._build_dataframe(table, spec)
+        self.gc._convert_dataframe(df, spec)
+        records = self.gc._build_records(table, spec)
+        self.gc._convert_records(records, spec)
+        self.assertEqual(["<1", "3"], [record["Certain reserves 2020"] for record in records])
+        self.assertEqual([65.0, None], [record["Probable reserves 2020"] for record in records])
+        self.assertEqual(1094.0, records[0]["Total reserves 2021"])
+        self.assertEqual(self.gc._to_json(df), json.loads(json.dumps(records)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -40,6 +40,11 @@ class TestGhanaConverter(unittest.TestCase):
         self.assertEqual(r[0]['Fuel Gas (MMscf)'], 372.82)
         self.assertEqual(r[1]['Oil Production (bbl)'], 909194.42)
 
+    def test_build_records_matches_dataframe(self):
+        converter = GhanaConverter()
+        table = self.example_table + [['2018-12-31', '-', '12', '0.5', '1,000', '-', '-', '-']]
+        self.assertEqual(converter._to_json(converter._convert_table(table)), converter._build_records(table))
+
     def test_identify_region(self):
         self.assertEqual(GhanaConverter._identify_field("2018 OCTP PRODUCTION"), "OCTP")
         self.assertEqual(GhanaConverter._identify_field("OCTP / Sankofa-Gye Nyame Production for the Year 2019"), "OCTP / Sankofa-Gye Nyame")
@@ -0,0 +1,80 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.instrumentation import JsonLinesMetricsSink, Observer
+from fossilregistryextractor.poland_converter import PolandConverter
+
+
+class CollectingObserver(Observer):
+    def __init__(self):
+        self.events = []
+
+    def event(self, name, **fields):
+        self.events.append((name, fields))
+
+    def named(self, name):
+        return [fields for event_name, fields in self.events if event_name == name]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_events(self):
+        observer = CollectingObserver()
+        PolandConverter(observer=observer).process_file("pdfs/poland/natural_gas_2015.pdf")
+        names = [name for name, _ in observer.events]
+        self.assertEqual("document_start", names[0])
+        self.assertEqual("document_end", names[-1])
+        self.assertEqual(7, len(observer.named("page_end")))
+        document_end = observer.named("document_end")[0]
+        self.assertEqual(sum(page["rows"] for page in observer.named("page_end")), document_end["rows"])
+        self.assertEqual("PolandConverter", document_end["converter"])
+        stages = {fields["stage"] for fields in observer.named("stage")}
+        self.assertEqual({"open", "extract_table", "records", "convert", "serialize"}, stages)
+
+    def test_ghana_page_end(self):
+        observer = CollectingObserver()
+        GhanaConverter(observer=observer).process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.assertEqual([12], [page["rows"] for page in observer.named("page_end")])
+
+    def test_document_end_reports_error(self):
+        observer = CollectingObserver()
+        with self.assertRaises(Exception):
+            GhanaConverter(observer=observer).process_file("pdfs/poland/natural_gas_2015.pdf")
+        self.assertIn("error", observer.named("document_end")[0])
+
+    def test_metrics_and_profile_from_command_line(self):
+        filename = shutil.copy("pdfs/ghana/2018-OCTP-Productions.pdf", self.directory.name)
+        metrics_filename = os.path.join(self.directory.name, "metrics.jsonl")
+        profile_filename = os.path.join(self.directory.name, "profile.prof")
+        GhanaConverter.main([filename, "--no-cache", "--metrics", metrics_filename, "--profile", profile_filename])
+        with open(metrics_filename, encoding="utf-8") as infile:
+            events = [json.loads(line) for line in infile]
+        self.assertEqual(["document_start", "stage", "page_start"], [e["event"] for e in events[0:3]])
+        self.assertEqual("open", events[1]["stage"])
+        self.assertEqual([12], [e["rows"] for e in events if e["event"] == "page_end"])
+        self.assertEqual(12, events[-1]["rows"])
+        self.assertGreater(pstats.Stats(profile_filename).total_calls, 0)
+
+    def test_metrics_sink_appends_from_worker_processes(self):
+        metrics_filename = os.path.join(self.directory.name, "metrics.jsonl")
+        sink = JsonLinesMetricsSink(metrics_filename)
+        PolandConverter(observer=sink).process_file("pdfs/poland/natural_gas_2015.pdf", workers=2)
+        sink.close()
+        with open(metrics_filename, encoding="utf-8") as infile:
+            events = [json.loads(line) for line in infile]
+        self.assertEqual(7, len([e for e in events if e["event"] == "page_end"]))
+        self.assertGreater(len({e["pid"] for e in events}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import pdfplumber as pdfplumber
+from pdfplumber.table import Table
+
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.page_analysis import PageAnalysis, extract_cells
+from fossilregistryextractor.poland_converter import PolandConverter
+
+
+class TestPageAnalysis(unittest.TestCase):
+    filenames = ["pdfs/poland/natural_gas_2015.pdf", "pdfs/poland/natural_gas_2020.pdf", "pdfs/ghana/2018-OCTP-Productions.pdf"]
+
+    def test_matches_pdfplumber(self):
+        for filename in self.filenames:
+            with pdfplumber.open(filename) as pdf:
+                for page in pdf.pages:
+                    analysis = PageAnalysis(page)
+                    x0, top, x1, bottom = page.bbox
+                    self.assertEqual(page.crop((x0, top, x1, top + 150)).extract_text(), analysis.header_text(150))
+                    self.assertEqual(page.extract_text(), analysis.text())
+                    self.assertEqual(page.extract_table(), analysis.table())
+
+    def test_text_tolerances(self):
+        with pdfplumber.open("pdfs/ghana/2018-OCTP-Productions.pdf") as pdf:
+            page = pdf.pages[0]
+            for table_settings in [{"text_x_tolerance": 0, "text_y_tolerance": 0}, {"text_y_tolerance": 20}]:
+                self.assertNotEqual(page.extract_table(), page.extract_table(table_settings))
+                self.assertEqual(page.extract_table(table_settings), PageAnalysis(page).table(table_settings))
+
+    def test_overlapping_cells(self):
+        with pdfplumber.open("pdfs/ghana/2018-OCTP-Productions.pdf") as pdf:
+            page = pdf.pages[0]
+            x0, top, x1, bottom = page.find_tables()[0].bbox
+            middle = (x0 + x1) / 2
+            table = Table(page, [(x0, top, x1, bottom), (x0, top, middle, bottom), (middle, top, x1, (top + bottom) / 2)])
+            self.assertEqual(table.extract(), extract_cells(table, page.chars))
+
+    def test_analyse_page_only_finds_wanted_tables(self):
+        converter = PolandConverter()
+        with pdfplumber.open("pdfs/poland/natural_gas_2015.pdf") as pdf:
+            content = converter.analyse_page(pdf.pages[0], GermanyConverter.HeaderRegionHeight, lambda text: False)
+            self.assertIsNone(content.table)
+            self.assertIn("Name of deposit", content.header_text)
+            content = converter.analyse_page(pdf.pages[0])
+            self.assertEqual(pdf.pages[0].extract_text(), content.header_text)
+            self.assertEqual(pdf.pages[0].extract_table(), content.table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import pdfplumber
+
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.page_cache import PageCache
+
+
+class TestPageCache(unittest.TestCase):
+    filename = "pdfs/poland/natural_gas_2015.pdf"
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reuses_extracted_table(self):
+        with pdfplumber.open(self.filename) as pdf:
+            first = self.cache.extract_table(pdf.pages[0])
+        with pdfplumber.open(self.filename) as pdf:
+            second = self.cache.extract_table(pdf.pages[0])
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_key_includes_page_and_settings(self):
+        with pdfplumber.open(self.filename) as pdf:
+            self.cache.extract_table(pdf.pages[0])
+            self.cache.extract_table(pdf.pages[1])
+            self.cache.extract_table(pdf.pages[0], {"vertical_strategy": "text"})
+            self.cache.extract_text(pdf.pages[0])
+        self.assertEqual(4, self.cache.misses)
+
+    def test_evicts_least_recently_used(self):
+        cache = PageCache(self.directory.name, max_bytes=1)
+        with pdfplumber.open(self.filename) as pdf:
+            cache.extract_text(pdf.pages[0])
+            cache.extract_text(pdf.pages[1])
+        self.assertEqual(0, len(list(cache._entries())))
+
+    def test_clear(self):
+        with pdfplumber.open(self.filename) as pdf:
+            self.cache.extract_text(pdf.pages[0])
+        self.cache.clear()
+        self.assertFalse(os.path.exists(self.directory.name))
+
+    def test_converter_output_unchanged(self):
+        uncached = GhanaConverter().process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        converter = GhanaConverter(cache=self.cache)
+        converter.process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        cached = converter.process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.assertEqual(uncached, cached)
+        self.assertEqual(1, self.cache.hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,10 @@
+import json
+import tracemalloc
 import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
 import pdfplumber as pdfplumber
 
 from fossilregistryextractor.poland_converter import PolandConverter
@@ -53,6 +59,12 @@ class TestPolandConverter(unittest.TestCase):
                            "Resources anticipated A+B", "Resources anticipated C", "Resources economic", "Output", "County"]
         self.assertEqual(expected_header, header)
 
+    def test_choose_headers_by_variant(self):
+        first_row = self.pc._filter_to_data(self.table2020)[0]
+        self.assertEqual(PolandConverter.Headers["9 columns"], PolandConverter(variant="9 columns")._choose_header(first_row))
+        with self.assertRaisesRegex(Exception, "Unexpected number of columns 9 for 7 columns"):
+            PolandConverter(variant="7 columns")._choose_header(first_row)
+
     def test_dataframe(self):
         pdf = pdfplumber.open("pdfs/poland/natural_gas_2020.pdf")
         df = PolandConverter().to_dataframe(pdf.pages[0])
@@ -75,12 +87,58 @@ class TestPolandConverter(unittest.TestCase):
                          self.pc._convert_value("123 s\n4,567.1"))
         self.assertEqual([{"value": None, "is_subeconomic": True}], self.pc._convert_value("antic.\nsubecon."))
 
+    def test_convert_values_matches_convert_value(self):
+        cells = ["123", "123s", "-", "123 s\n4,567.1", "antic.\nsubecon.", "", "1.2.3\n- s"]
+        expected = [self.pc._convert_value(cell) for cell in cells]
+        self.assertEqual(expected, self.pc._convert_values(pd.DataFrame({"Output": cells}))[0].tolist())
+
+    def test_lookup_statuses(self):
+        self.assertEqual(["Exploited", "Abandoned", "Exploited"], self.pc._lookup_statuses(pd.Series(["E", "Z", "E"])).tolist())
+        with self.assertRaises(KeyError):
+            self.pc._lookup_statuses(pd.Series(["E", "X"]))
+
+    def test_records_match_dataframe(self):
+        for table in [self.table2015, self.table2020]:
+            expected = self.pc._to_json(self.pc._convert_table(table))
+            self.assertEqual(expected, self.pc._convert_records(self.pc._build_records(table)))
+
     def test_process(self):
         json_output = self.pc.process_file("pdfs/poland/natural_gas_2020.pdf")
         self.assertIn('"Name of field": "B 21"', json_output, "Could not find expected name of field")
         json_output = self.pc.process_file("pdfs/poland/natural_gas_2015.pdf")
         self.assertIn('"Name of field": "B 3"', json_output, "Could not find expected name of field")
 
+    def test_process_parallel(self):
+        serial_output = self.pc.process_file("pdfs/poland/natural_gas_2015.pdf")
+        parallel_output = self.pc.process_file("pdfs/poland/natural_gas_2015.pdf", workers=3)
+        self.assertEqual(serial_output, parallel_output)
+
+    def test_page_ranges(self):
+        self.assertEqual([(0, 2), (2, 3), (3, 4), (4, 5)], self.pc._page_ranges(5, 1))
+        self.assertEqual([(0, 1), (1, 2), (2, 3)], self.pc._page_ranges(3, 2))
+
+    def test_iter_records(self):
+        records = list(self.pc.iter_records("pdfs/poland/natural_gas_2015.pdf"))
+        self.assertEqual(json.loads(self.pc.process_file("pdfs/poland/natural_gas_2015.pdf")), records)
+
+    def test_iter_records_memory_is_bounded_by_a_page(self):
+        data_row = ['1', None, 'B 21', 'R', None, None, '275.00', None, None, '-', None, None, '275.00', None, None, '261.23', None, '-', 'Bałtyk (off shore)']
+        page_table = self.table2020[0:7] + [data_row] * 50
+
+        def peak_memory(page_count):
+            converter = PolandConverter()
+            with mock.patch.object(converter, "_iter_pages", lambda filename: (SimpleNamespace(page_number=i) for i in range(page_count))), \
+                    mock.patch.object(converter, "extract_page_table", lambda page, **options: page_table):
+                tracemalloc.start()
+                record_count = sum(1 for _ in converter.iter_records("synthetic.pdf"))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self.assertEqual(page_count * 50, record_count)
+            return peak
+
+        peak_memory(1)  # first use allocates pandas' and re's caches
+        self.assertLess(peak_memory(100), 1.5 * peak_memory(10))
+
 
 if __name__ == '__main__':
     unittest.main()
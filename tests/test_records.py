@@ -0,0 +1,21 @@
+import unittest
+
+import pandas as pd
+
+from fossilregistryextractor.records import build_records, iso_timestamp
+
+
+class TestRecords(unittest.TestCase):
+    def test_build_records(self):
+        self.assertEqual([{"a": "1", "b": "2"}, {"a": "3", "b": None}], build_records([["1", "2"], ["3"]], ["a", "b"]))
+        with self.assertRaises(ValueError):
+            build_records([["1", "2", "3"]], ["a", "b"])
+
+    def test_iso_timestamp(self):
+        for text in ["January, 2018", "Sept 2019", "2018-02-03", "3 March 2020", "01/02/2018", "1/2/2018", "12/11/2019", None]:
+            expected = None if text is None else pd.Series([pd.Timestamp(text)]).to_json(orient="records", date_format="iso")[2:-2]
+            self.assertEqual(expected, iso_timestamp(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from fossilregistryextractor.batch import BatchRunner
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.poland_converter import PolandConverter
+from fossilregistryextractor.registry_store import RegistryStore, document_period, iter_measurements, records_from_output
+
+
+class TestRegistryStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = RegistryStore(os.path.join(self.directory.name, "registry.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_load_and_query(self):
+        self.assertEqual(79, self.store.load_file(GhanaConverter(), "pdfs/ghana/2018-OCTP-Productions.pdf"))
+        self.store.load_file(PolandConverter(), "pdfs/poland/natural_gas_2015.pdf")
+        rows = self.store.query(field="octp", period="2018-03", metric="Oil%")
+        self.assertEqual([("Ghana", "OCTP", "2018-03-01", "Oil Production (bbl)", 911716.9, False)],
+                         [(r["country"], r["field"], r["period"], r["metric"], r["value"], r["is_subeconomic"]) for r in rows])
+        rows = self.store.query(field="B 4", country="poland")
+        self.assertEqual({("2015", "Resources anticipated economic", 2686.6), ("2015", "Resources economic", 1972.4)},
+                         {(r["period"], r["metric"], r["value"]) for r in rows})
+        self.assertTrue(rows[0]["document"].endswith("natural_gas_2015.pdf"))
+
+    def test_reloading_replaces_the_documents_rows(self):
+        self.store.load_file(PolandConverter(), "pdfs/poland/natural_gas_2015.pdf")
+        counts = self.store.counts()
+        self.store.load_file(PolandConverter(), "pdfs/poland/natural_gas_2015.pdf")
+        self.assertEqual(counts, self.store.counts())
+        self.store.remove("pdfs/poland/natural_gas_2015.pdf")
+        self.assertEqual(0, self.store.counts()["measurements"])
+
+    def test_failed_load_is_rolled_back(self):
+        self.store.load_file(GhanaConverter(), "pdfs/ghana/2018-OCTP-Productions.pdf")
+        records = [{"Country": "Ghana", "Field": "Jubilee", "Oil": 1.0}, {"Country": None, "Field": "Jubilee", "Oil": 2.0}]
+        with self.assertRaises(ValueError):
+            self.store.load("pdfs/ghana/2018-OCTP-Productions.pdf", "GhanaConverter", records, GhanaConverter().record_field)
+        self.assertEqual(79, self.store.counts()["measurements"])
+        self.assertEqual([], self.store.query(field="Jubilee"))
+        self.store.load("pdfs/ghana/2018-OCTP-Productions.pdf", "GhanaConverter", records[:1], GhanaConverter().record_field)
+        self.assertEqual(1, len(self.store.query(field="Jubilee")))
+
+    def test_iter_measurements(self):
+        records = [{"Number": "1", "Name of field": "B 3", "Resources": [{"value": 1.5, "is_subeconomic": True}, {"value": None, "is_subeconomic": False}],
+                    "Output": [{"value": 2, "is_subeconomic": False}], "County": ["Bałtyk"], "Country": "Poland"}]
+        self.assertEqual([("Poland", "B 3", "2015", "Resources", 1.5, True), ("Poland", "B 3", "2015", "Output", 2.0, False)],
+                         list(iter_measurements(records, PolandConverter().record_field, "2015")))
+        germany = list(records_from_output([{"purpose": "Oil reserves", "data": [{"State/Territory": "Bayern", "Total reserves 2021": 1094,
+                                                                                  "Certain reserves 2020": None, "Country": "Germany"}]}]))
+        self.assertEqual([("Germany", "Bayern", "2020", "Oil reserves: Total reserves 2021", 1094.0, False)],
+                         list(iter_measurements(germany, GermanyConverter().record_field, "2020")))
+
+    def test_document_period(self):
+        self.assertEqual("2015", document_period("pdfs/poland/natural_gas_2015.pdf"))
+        self.assertEqual("2020", document_period("Jahresbericht2020.pdf"))
+        self.assertIsNone(document_period("report.pdf"))
+
+    def test_batch(self):
+        os.makedirs(os.path.join(self.directory.name, "ghana"))
+        with open("pdfs/ghana/2018-OCTP-Productions.pdf", "rb") as infile, \
+                open(os.path.join(self.directory.name, "ghana", "2018-OCTP-Productions.pdf"), "wb") as outfile:
+            outfile.write(infile.read())
+        summary = BatchRunner(self.directory.name, workers=1, database=self.store.filename).run()
+        self.assertEqual(79, summary["files"][0]["measurements"])
+        self.assertEqual(12, len(self.store.query(field="OCTP", metric="Oil Production%")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.poland_converter import PolandConverter
+from fossilregistryextractor.service import ExtractionServer, ExtractionService, QueueFull, percentiles
+
+
+def request(url, data=None, content_type="application/pdf"):
+    headers = {} if data is None else {"Content-Type": content_type}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers)) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+class TestExtractionService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ExtractionService(workers=1, queue_size=4)
+        cls.service.warm_up()
+        cls.server = ExtractionServer(("127.0.0.1", 0), cls.service)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def submit(self, data, query="", content_type="application/pdf"):
+        status, body = request(f"{self.url}/jobs{query}", data, content_type)
+        self.assertEqual(202, status, body)
+        return json.loads(body)["job"]
+
+    def results(self, job_id):
+        status, body = request(f"{self.url}/jobs/{job_id}/results")
+        self.assertEqual(200, status)
+        return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+    def test_upload(self):
+        with open("pdfs/ghana/2018-OCTP-Productions.pdf", "rb") as infile:
+            job_id = self.submit(infile.read())
+        expected = list(GhanaConverter().iter_records("pdfs/ghana/2018-OCTP-Productions.pdf"))
+        self.assertEqual(expected, self.results(job_id))
+        status, body = request(f"{self.url}/jobs/{job_id}")
+        self.assertEqual({"status": "done", "rows": 12, "converter": "GhanaConverter", "variant": "monthly production"},
+                         {k: v for k, v in json.loads(body).items() if k in ("status", "rows", "converter", "variant")})
+
+    def test_path(self):
+        path = os.path.abspath("pdfs/poland/natural_gas_2015.pdf")
+        job_id = self.submit(json.dumps({"path": path}).encode("utf-8"), content_type="application/json")
+        self.assertEqual(list(PolandConverter().iter_records(path)), self.results(job_id))
+
+    def test_failed_job(self):
+        job_id = self.submit(b"not a PDF", "?converter=ghana")
+        records = self.results(job_id)
+        self.assertIn("error", records[-1])
+        self.assertEqual("failed", json.loads(request(f"{self.url}/jobs/{job_id}")[1])["status"])
+
+    def test_bad_requests(self):
+        self.assertEqual(400, request(f"{self.url}/jobs?converter=peru", b"%PDF")[0])
+        self.assertEqual(400, request(f"{self.url}/jobs", b"%PDF")[0])
+        with open("pdfs/ghana/2018-OCTP-Productions.pdf", "rb") as infile:
+            self.assertEqual(400, request(f"{self.url}/jobs", infile.read()[:2000])[0])
+        self.assertEqual(400, request(f"{self.url}/jobs", b'{"path": "missing.pdf"}', "application/json")[0])
+        self.assertEqual(404, request(f"{self.url}/jobs/unknown")[0])
+        self.assertEqual(404, request(f"{self.url}/jobs/unknown/results")[0])
+
+    def test_stats(self):
+        with open("pdfs/ghana/2018-OCTP-Productions.pdf", "rb") as infile:
+            self.results(self.submit(infile.read(), "?converter=ghana"))
+        stats = json.loads(request(f"{self.url}/stats")[1])
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertGreaterEqual(stats["done"], 1)
+        self.assertGreater(stats["jobs_per_second"], 0)
+        self.assertLessEqual(stats["latency"]["p50"], stats["latency"]["p99"])
+
+
+class TestBackpressure(unittest.TestCase):
+    def setUp(self):
+        self.service = ExtractionService(workers=1, queue_size=2)
+        # Jobs that never finish, so that the queue fills up
+        self.futures = []
+        self.service._executor.submit = lambda *args: self.futures.append(Future()) or self.futures[-1]
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_rejects_when_full(self):
+        path = "pdfs/ghana/2018-OCTP-Productions.pdf"
+        self.service.submit(path)
+        self.service.submit(path)
+        with self.assertRaises(QueueFull):
+            self.service.submit(path)
+        self.futures[0].set_result({"started": time.time(), "rows": 3, "skipped_pages": []})
+        job = self.service.submit(path)
+        self.assertEqual("queued", job.status)
+        stats = self.service.stats()
+        self.assertEqual({"submitted": 3, "done": 1, "rejected": 1, "queue_depth": 2, "rows": 3},
+                         {k: stats[k] for k in ("submitted", "done", "rejected", "queue_depth", "rows")})
+
+    def test_429(self):
+        server = ExtractionServer(("127.0.0.1", 0), self.service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/jobs?converter=ghana"
+            self.assertEqual([202, 202, 429], [request(url, b"%PDF")[0] for _ in range(3)])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_forgets_old_jobs(self):
+        self.service.retained_jobs = 1
+        first = self.service.submit("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.futures[0].set_result({"started": time.time(), "rows": 0, "skipped_pages": []})
+        second = self.service.submit("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.futures[1].set_result({"started": time.time(), "rows": 0, "skipped_pages": []})
+        self.assertIsNone(self.service.job(first.id))
+        self.assertIs(second, self.service.job(second.id))
+
+
+class TestPercentiles(unittest.TestCase):
+    def test_percentiles(self):
+        self.assertEqual({"p50": 50, "p90": 90, "p99": 99}, percentiles(range(1, 101)))
+        self.assertEqual({"p50": 1, "p90": 1, "p99": 1}, percentiles([1]))
+        self.assertEqual({"p50": None, "p90": None, "p99": None}, percentiles([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
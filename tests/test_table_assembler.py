@@ -0,0 +1,73 @@
+import json
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.table_assembler import TableAssembler
+
+
+def rows(*values):
+    return pd.DataFrame({"Field": list(values)})
+
+
+class TestTableAssembler(unittest.TestCase):
+    pages = [
+        ("Oil reserves", False, rows("a", "b")),
+        ("", True, rows("c")),       # continuation pages
+        ("", True, None),
+        ("", True, rows("d")),
+        ("", False, None),           # a page with no wanted table ends the table
+        ("Raw gas reserves", False, rows("e")),
+        ("Clean gas reserves", False, rows("f")),
+        ("", True, rows("g")),
+    ]
+
+    def test_tables(self):
+        tables = [(purpose, df["Field"].tolist()) for purpose, df in TableAssembler().tables(self.pages)]
+        self.assertEqual([("Oil reserves", ["a", "b", "c", "d"]), ("Raw gas reserves", ["e"]),
+                          ("Clean gas reserves", ["f", "g"])], tables)
+
+    def test_tables_are_yielded_as_soon_as_they_end(self):
+        pages_read = []
+
+        def pages():
+            for i, page in enumerate(self.pages):
+                pages_read.append(i)
+                yield page
+
+        tables = TableAssembler().tables(pages())
+        self.assertEqual("Oil reserves", next(tables)[0])
+        self.assertEqual([0, 1, 2, 3, 4], pages_read)
+        self.assertEqual("Raw gas reserves", next(tables)[0])
+        self.assertEqual(6, pages_read[-1])
+
+    def test_concatenates_once_per_table(self):
+        pages = [("Oil reserves", i > 0, rows(str(i))) for i in range(50)]
+        with mock.patch("pandas.concat", wraps=pd.concat) as concat:
+            tables = list(TableAssembler().tables(pages))
+        self.assertEqual(1, concat.call_count)
+        self.assertEqual(50, len(tables[0][1]))
+
+    def test_combine(self):
+        pages = [("Oil reserves", False, [{"Field": "a"}]), ("", True, [{"Field": "b"}]), ("Raw gas reserves", False, [])]
+        tables = list(TableAssembler(combine=lambda chunks: [r for chunk in chunks for r in chunk]).tables(pages))
+        self.assertEqual([("Oil reserves", [{"Field": "a"}, {"Field": "b"}]), ("Raw gas reserves", [])], tables)
+
+    def test_page_chunks(self):
+        chunks = [(purpose, df["Field"].tolist()) for purpose, df in TableAssembler().page_chunks(self.pages)]
+        self.assertEqual([("Oil reserves", ["a", "b"]), ("Oil reserves", ["c"]), ("Oil reserves", ["d"]),
+                          ("Raw gas reserves", ["e"]), ("Clean gas reserves", ["f"]), ("Clean gas reserves", ["g"])], chunks)
+
+    def test_germany_process_file(self):
+        converter = GermanyConverter()
+        pages = [(purpose, is_continuation, None if df is None else df.to_dict("records")) for purpose, is_continuation, df in self.pages]
+        with mock.patch.object(converter, "_iter_page_records", lambda filename, document: iter(pages)):
+            output = json.loads(converter.process_file("report.pdf"))
+        self.assertEqual(["Oil reserves", "Raw gas reserves", "Clean gas reserves"], [table["purpose"] for table in output])
+        self.assertEqual([{"Field": "a"}, {"Field": "b"}, {"Field": "c"}, {"Field": "d"}], output[0]["data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
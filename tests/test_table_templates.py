@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import pdfplumber as pdfplumber
+
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.page_analysis import PageAnalysis
+from fossilregistryextractor.page_cache import PageCache
+from fossilregistryextractor.poland_converter import PolandConverter
+from fossilregistryextractor.table_templates import TableTemplate, TemplateStore
+from synthetic_pdf import write_poland_pdf
+
+
+class TestTableTemplates(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_template_matches_detection(self, filename):
+        with pdfplumber.open(filename) as pdf:
+            table, template = TableTemplate.detect(PageAnalysis(pdf.pages[0]))
+            self.assertEqual(pdf.pages[0].extract_table(), table)
+            self.assertIsNotNone(template)
+            for page in pdf.pages:
+                self.assertEqual(page.extract_table(), template.extract_table(page))
+
+    def test_matches_detection(self):
+        self.assert_template_matches_detection("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.assert_template_matches_detection("pdfs/poland/natural_gas_2015.pdf")
+        self.assert_template_matches_detection(write_poland_pdf(os.path.join(self.directory.name, "synthetic.pdf"), 3))
+
+    def test_other_layouts_do_not_fit(self):
+        with pdfplumber.open("pdfs/poland/natural_gas_2015.pdf") as pdf:
+            _, poland2015 = TableTemplate.detect(PageAnalysis(pdf.pages[0]))
+        with pdfplumber.open("pdfs/ghana/2018-OCTP-Productions.pdf") as pdf:
+            _, ghana = TableTemplate.detect(PageAnalysis(pdf.pages[0]))
+            self.assertIsNone(poland2015.extract_table(pdf.pages[0]))
+        with pdfplumber.open("pdfs/poland/natural_gas_2020.pdf") as pdf:
+            for page in pdf.pages:
+                self.assertIsNone(poland2015.extract_table(page))
+                self.assertIsNone(ghana.extract_table(page))
+
+    def test_layout_that_cannot_be_reproduced_is_not_learned(self):
+        # The 2020 report's shaded rows make cells of their own, which a template doesn't reproduce
+        with pdfplumber.open("pdfs/poland/natural_gas_2020.pdf") as pdf:
+            table, template = TableTemplate.detect(PageAnalysis(pdf.pages[0]))
+            self.assertEqual(pdf.pages[0].extract_table(), table)
+            self.assertIsNone(template)
+
+    def test_converter_output_is_unchanged(self):
+        store = TemplateStore()
+        for filename in ["pdfs/poland/natural_gas_2015.pdf", "pdfs/poland/natural_gas_2020.pdf"]:
+            self.assertEqual(PolandConverter().process_file(filename), PolandConverter(templates=store).process_file(filename))
+        # The first page of 2015 is detected and the rest use its template; every page of 2020 falls back
+        self.assertEqual(6, store.hits)
+        self.assertEqual(1 + 5, store.misses)
+        self.assertEqual(1, len(store.candidates("PolandConverter")))
+
+    def test_with_page_cache(self):
+        filename = "pdfs/poland/natural_gas_2015.pdf"
+        cache = PageCache(os.path.join(self.directory.name, "cache"))
+        store = TemplateStore()
+        expected = PolandConverter().process_file(filename)
+        self.assertEqual(expected, PolandConverter(cache=cache, templates=store).process_file(filename))
+        self.assertEqual(expected, PolandConverter(cache=cache, templates=store).process_file(filename))
+        # The first page is now extracted with the template too, so only the other six are found in the cache
+        self.assertEqual(6, cache.hits)
+
+    def test_store_saves_and_loads(self):
+        filename = os.path.join(self.directory.name, "templates.json")
+        store = TemplateStore(filename)
+        GhanaConverter(templates=store).process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        store.save()
+        loaded = TemplateStore(filename)
+        self.assertEqual(store.candidates("GhanaConverter"), loaded.candidates("GhanaConverter"))
+        GhanaConverter(templates=loaded).process_file("pdfs/ghana/2018-OCTP-Productions.pdf")
+        self.assertEqual(1, loaded.hits)
+
+    def test_store_keeps_most_recently_used(self):
+        templates = [TableTemplate((0, 0, 100, 100), (0, i, 100)) for i in range(1, 5)]
+        store = TemplateStore(max_templates=3)
+        for template in templates:
+            store.use("family", template)
+        self.assertEqual(templates[:0:-1], store.candidates("family"))
+        store.use("family", templates[2])
+        self.assertEqual([templates[2], templates[3], templates[1]], store.candidates("family"))
+
+
+if __name__ == '__main__':
+    unittest.main()
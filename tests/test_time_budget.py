@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from fossilregistryextractor.batch import BatchRunner, _convert_file
+from fossilregistryextractor.poland_converter import PolandConverter
+from fossilregistryextractor.time_budget import BudgetExceeded, TimeBudget, call_with_timeout
+from synthetic_pdf import write_poland_pdf
+from test_instrumentation import CollectingObserver
+
+TextStrategy = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+
+def fail():
+    raise ValueError("no table")
+
+
+class TestTimeBudget(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        # The second page's table takes pdfplumber several seconds to find
+        cls.slow_pdf = write_poland_pdf(os.path.join(cls.directory.name, "slow.pdf"), 3, slow_pages=(2,))
+        cls.pdf = write_poland_pdf(os.path.join(cls.directory.name, "natural_gas.pdf"), 3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_call_with_timeout(self):
+        self.assertEqual(3, call_with_timeout(lambda: 1 + 2, 5))
+        started = time.perf_counter()
+        with self.assertRaises(BudgetExceeded):
+            call_with_timeout(lambda: time.sleep(10), 0.2)
+        self.assertLess(time.perf_counter() - started, 5)
+        with self.assertRaises(ValueError):
+            call_with_timeout(fail, 5)
+
+    def test_falls_back_to_cheaper_settings(self):
+        observer = CollectingObserver()
+        converter = PolandConverter(budget=TimeBudget(page_seconds=2), observer=observer)
+        output = converter.process_file(self.slow_pdf)
+        self.assertEqual(PolandConverter().process_file(self.pdf), output)
+        self.assertEqual([], converter.skipped_pages)
+        self.assertEqual([(2, None)], [(fields["page"], fields["table_settings"]) for name, fields in observer.events if name == "page_timeout"])
+
+    def test_skips_page_when_fallback_fails(self):
+        observer = CollectingObserver()
+        converter = PolandConverter(budget=TimeBudget(page_seconds=1, fallback_table_settings=(TextStrategy,)), observer=observer)
+        records = list(converter.iter_records(self.slow_pdf))
+        self.assertEqual(50, len(records))
+        self.assertEqual(["Field 1", "Field 51"], [records[0]["Name of field"], records[25]["Name of field"]])
+        self.assertEqual([{"page": 2, "reason": "time budget exceeded"}], converter.skipped_pages)
+        self.assertIn("page_fallback_rejected", [name for name, fields in observer.events])
+
+    def test_skipped_pages_are_saved(self):
+        budget = TimeBudget(page_seconds=1, fallback_table_settings=())
+        result = _convert_file(self.slow_pdf, BatchRunner.Classifier, None, None, budget)
+        self.assertEqual(("converted", 50, [2]), (result["status"], result["rows"], result["skipped_pages"]))
+        with open(PolandConverter.output_filename(self.slow_pdf, ".meta.json")) as infile:
+            self.assertEqual([{"page": 2, "reason": "time budget exceeded"}], json.load(infile)["skipped_pages"])
+        # The metadata goes once a conversion skips nothing
+        PolandConverter(budget=TimeBudget(page_seconds=1)).process_and_save_file(self.slow_pdf)
+        self.assertFalse(os.path.exists(PolandConverter.output_filename(self.slow_pdf, ".meta.json")))
+
+    def test_document_budget(self):
+        converter = PolandConverter(budget=TimeBudget(document_seconds=0))
+        self.assertEqual([], json.loads(converter.process_file(self.pdf)))
+        self.assertEqual([1, 2, 3], [skipped["page"] for skipped in converter.skipped_pages])
+        self.assertEqual("document time budget exceeded", converter.skipped_pages[0]["reason"])
+
+
+if __name__ == '__main__':
+    unittest.main()
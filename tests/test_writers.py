@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from fossilregistryextractor.germany_converter import GermanyConverter
+from fossilregistryextractor.ghana_converter import GhanaConverter
+from fossilregistryextractor.poland_converter import PolandConverter
+from fossilregistryextractor.writers import Writers
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.poland_filename = shutil.copy("pdfs/poland/natural_gas_2015.pdf", self.directory.name)
+        self.ghana_filename = shutil.copy("pdfs/ghana/2018-OCTP-Productions.pdf", self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_csv_values_in_long_format(self):
+        table_filename, values_filename = PolandConverter().process_and_write_file(self.poland_filename, "csv")
+        table = pd.read_csv(table_filename)
+        values = pd.read_csv(values_filename)
+        self.assertNotIn("Output", table.columns)
+        self.assertEqual("Bałtyk (off shore)", table["County"][0])
+        self.assertEqual(["field", "column", "value", "is_subeconomic"], list(values.columns))
+        b3_output = values[(values["field"] == "B 3") & (values["column"] == "Output")]
+        self.assertEqual([14.69], list(b3_output["value"]))
+        self.assertEqual([False], list(b3_output["is_subeconomic"]))
+
+    def test_parquet(self):
+        table_filename, values_filename = PolandConverter().process_and_write_file(self.poland_filename, "parquet")
+        table = pd.read_parquet(table_filename)
+        values = pd.read_parquet(values_filename)
+        self.assertEqual(["Bałtyk (off shore)"], list(table["County"][0]))
+        self.assertEqual("float64", str(values["value"].dtype))
+        self.assertEqual("bool", str(values["is_subeconomic"].dtype))
+
+    def test_arrow_without_values(self):
+        import pyarrow as pa
+        output_filenames = GhanaConverter().process_and_write_file(self.ghana_filename, "arrow")
+        self.assertEqual(1, len(output_filenames))
+        with pa.memory_map(output_filenames[0]) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertEqual(12, table.num_rows)
+        self.assertEqual(1098754.5, table.column("Oil Production (bbl)")[0].as_py())
+
+    # The Poland report has none of the German tables
+    def test_empty_document(self):
+        for output_format in ["csv", "parquet", "arrow"]:
+            output_filenames = GermanyConverter().process_and_write_file(self.poland_filename, output_format)
+            self.assertEqual(1, len(output_filenames), output_format)
+        self.assertEqual(0, len(pd.read_parquet(output_filenames[0].replace(".arrow", ".parquet"))))
+        with open(output_filenames[0].replace(".arrow", ".csv")) as infile:
+            self.assertEqual("", infile.read().strip())
+
+    def test_json_is_default(self):
+        output_filenames = GhanaConverter().process_and_write_file(self.ghana_filename)
+        self.assertEqual([os.path.join(self.directory.name, "2018-OCTP-Productions.json")], output_filenames)
+        self.assertEqual(["json", "ndjson", "csv", "parquet", "arrow"], list(Writers))
+
+
+if __name__ == '__main__':
+    unittest.main()